@@ -3,30 +3,62 @@ Advisor agent for LLM-based infrastructure upgrade recommendations.
 """
 
 import asyncio
-from datetime import datetime, timedelta
-from typing import Dict, Any
+from datetime import datetime, time, timedelta
+from pathlib import Path
+from typing import Dict, Any, Optional
+import joblib
 
 from core.state import state_manager
 from core.logger import logger
 from utils.gemini import llm_orchestrator
+from utils.llm_cache import llm_cache
 
 
 class AdvisorAgent:
     """Runs daily, calls LLM for infrastructure advice, and updates the global state."""
     
-    def __init__(self, update_interval: float = 24*60*60):  # Once per day
+    def __init__(self, update_interval: float = 24*60*60, run_time: time = time(2, 0),
+                 retry_interval: float = 60*60, cache_file: str = ".cache/advisor.pkl"):
         self.update_interval = update_interval
+        self.run_time = run_time  # Time of day for the daily run
+        self.retry_interval = retry_interval  # Retry delay when today's run failed
+        self.cache_file = Path(cache_file)
         self.running = False
         self.last_run_date = None
+        self._cached_advice: Optional[Dict[str, Any]] = None
+        self._load_cached_advice()
+    
+    def _load_cached_advice(self) -> None:
+        """Restore today's advice from disk so a restart doesn't re-call the LLM."""
+        try:
+            cached = joblib.load(self.cache_file)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"Error loading cached advice: {e}")
+            return
+        if cached.get("date") == datetime.now().date():
+            self.last_run_date = cached["date"]
+            self._cached_advice = cached.get("result")
+    
+    def _save_cached_advice(self, run_date, result: Dict[str, Any]) -> None:
+        """Persist the latest advice to disk."""
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            joblib.dump({"date": run_date, "result": result}, self.cache_file)
+        except Exception as e:
+            print(f"Error saving cached advice: {e}")
     
     async def start(self) -> None:
         self.running = True
         await logger.log_event("agent_started", {"agent": "advisor"}, "advisor_agent")
         print("Advisor agent started")
+        if self._cached_advice:
+            await state_manager.update_state(infrastructure_advice=self._cached_advice)
         try:
             while self.running:
                 await self._run_advice()
-                await asyncio.sleep(self.update_interval)
+                await asyncio.sleep(self._seconds_until_next_run())
         except asyncio.CancelledError:
             print("Advisor agent cancelled")
         except Exception as e:
@@ -41,28 +73,51 @@ class AdvisorAgent:
         if self.last_run_date == today:
             return  # Already ran today
         try:
-            # Call LLM for infrastructure advice
-            result = await llm_orchestrator.get_infrastructure_advice(
+            # Call LLM for infrastructure advice, reusing the response for unchanged (rounded) inputs
+            cache_key = (
+                "infrastructure_advice",
+                round(state.load_kwh, 0),
+                round(state.solar_kwh, 0),
+                round(state.battery_soc, 0),
+                round(state.total_cost_eur, 0),
+                round(state.total_co2_kg, 0)
+            )
+            result = await llm_cache.get_or_call(cache_key, lambda: llm_orchestrator.get_infrastructure_advice(
                 daily_consumption=state.load_kwh,
                 solar_capacity=state.solar_kwh,
                 battery_capacity=state.battery_soc,  # Placeholder: use actual battery capacity if available
                 annual_cost=state.total_cost_eur * 365,  # Estimate
                 annual_co2=state.total_co2_kg * 365  # Estimate
-            )
+            ), ttl=24*60*60)
             if result and "recommendations" in result:
                 await state_manager.update_state(infrastructure_advice=result)
                 await logger.log_event("infrastructure_advice", result, "advisor_agent")
                 self.last_run_date = today
+                self._save_cached_advice(today, result)
             else:
                 await logger.log_error("No valid infrastructure advice from LLM.", "advisor_agent")
         except Exception as e:
             await logger.log_error(f"Error in LLM infrastructure advice: {e}", "advisor_agent", e)
     
+    def _seconds_until_next_run(self) -> float:
+        """Seconds until the next daily run, or until a retry if today's run failed."""
+        now = datetime.now()
+        # Once per day, at run_time (02:00 by default)
+        next_run = datetime.combine(now.date(), self.run_time)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        delay = (next_run - now).total_seconds()
+        if self.last_run_date != now.date():
+            delay = min(delay, self.retry_interval)
+        return delay
+    
     async def stop(self) -> None:
         self.running = False
     
     def get_status(self) -> Dict[str, Any]:
         return {
             "running": self.running,
-            "update_interval": self.update_interval
+            "update_interval": self.update_interval,
+            "run_time": self.run_time.isoformat(),
+            "last_run_date": self.last_run_date.isoformat() if self.last_run_date else None
         } 
\ No newline at end of file
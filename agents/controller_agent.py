@@ -7,7 +7,7 @@ from datetime import datetime
 from typing import Dict, Any
 
 from core.state import state_manager
-from core.logger import logger
+from core.logger import logger, fire_log
 
 
 class ControllerAgent:
@@ -16,6 +16,7 @@ class ControllerAgent:
     def __init__(self, update_interval: float = 60.0):
         self.update_interval = update_interval
         self.running = False
+        self._last_statuses = (None, None, None)
     
     async def start(self) -> None:
         self.running = True
@@ -34,7 +35,7 @@ class ControllerAgent:
             await logger.log_event("agent_stopped", {"agent": "controller"}, "controller_agent")
     
     async def _control_logic(self) -> None:
-        state = await state_manager.get_state()
+        state = await state_manager.get_snapshot()
         now = datetime.now()
         hour = now.hour
         weekday = now.weekday()
@@ -48,13 +49,19 @@ class ControllerAgent:
         lighting_status = "on" if occupancy else "off"
         machine_status = "on" if business_hours else "standby"
         
+        # Nothing to do if the statuses haven't changed since the last tick
+        statuses = (hvac_status, lighting_status, machine_status)
+        if statuses == self._last_statuses:
+            return
+        self._last_statuses = statuses
+        
         await state_manager.update_state(
             hvac_status=hvac_status,
             lighting_status=lighting_status,
             machine_status=machine_status
         )
         
-        await logger.log_event("controller_update", {
+        fire_log("controller_update", {
             "hvac_status": hvac_status,
             "lighting_status": lighting_status,
             "machine_status": machine_status
@@ -9,6 +9,7 @@ from typing import Dict, Any
 from core.state import state_manager, Decision
 from core.logger import logger
 from utils.gemini import llm_orchestrator
+from utils.llm_cache import llm_cache
 
 
 class DecisionAgent:
@@ -35,16 +36,24 @@ class DecisionAgent:
             await logger.log_event("agent_stopped", {"agent": "decision"}, "decision_agent")
     
     async def _make_decision(self) -> None:
-        state = await state_manager.get_state()
+        state = await state_manager.get_snapshot()
         try:
-            # Call LLM for decision
-            result = await llm_orchestrator.make_decision(
+            # Call LLM for decision, reusing the response for unchanged (bucketized) inputs
+            cache_key = (
+                "decision",
+                round(state.solar_forecast_kwh, 1),
+                round(state.load_forecast_kwh, 1),
+                round(state.battery_soc, 0),
+                round(state.grid_price, 3),
+                round(state.co2_intensity, 1)
+            )
+            result = await llm_cache.get_or_call(cache_key, lambda: llm_orchestrator.make_decision(
                 solar_kwh=state.solar_forecast_kwh,
                 load_kwh=state.load_forecast_kwh,
                 battery_soc=state.battery_soc,
                 price=state.grid_price,
                 co2_intensity=state.co2_intensity
-            )
+            ))
             if result and "action" in result:
                 decision = Decision(
                     action=result["action"],
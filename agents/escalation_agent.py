@@ -4,11 +4,12 @@ Escalation agent for handling supervisor notifications and escalations.
 
 import asyncio
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Tuple, Union
 
 from core.state import state_manager
 from core.logger import logger
 from utils.gemini import llm_orchestrator
+from utils.llm_cache import llm_cache
 
 
 class EscalationAgent:
@@ -35,24 +36,44 @@ class EscalationAgent:
             await logger.log_event("agent_stopped", {"agent": "escalation"}, "escalation_agent")
     
     async def _check_escalation(self) -> None:
-        state = await state_manager.get_state()
+        state = await state_manager.get_snapshot()
+        alert_messages = []
         if not state.auto_control_enabled:
             # Compose escalation message
-            alert_message = "Auto-control is currently disabled. Manual intervention required."
-            system_status = state.system_status
-            response = await llm_orchestrator.handle_escalation(alert_message, system_status)
+            alert_messages.append("Auto-control is currently disabled. Manual intervention required.")
+        # Check for critical alerts
+        for alert in state.active_alerts:
+            if alert.level in ("error", "critical"):
+                alert_messages.append(alert.message)
+        if not alert_messages:
+            return
+        # Issue all escalation LLM calls concurrently and log each as soon as it completes
+        for next_done in asyncio.as_completed(
+            [self._escalate(message, state.system_status) for message in alert_messages]
+        ):
+            alert_message, response = await next_done
+            if isinstance(response, Exception):
+                await logger.log_error(f"Error in LLM escalation: {response}", "escalation_agent", response)
+                continue
             await logger.log_event("escalation_message", {
                 "alert_message": alert_message,
                 "response": response
             }, "escalation_agent")
-        # Check for critical alerts
-        for alert in state.active_alerts:
-            if alert.level in ("error", "critical"):
-                response = await llm_orchestrator.handle_escalation(alert.message, state.system_status)
-                await logger.log_event("escalation_message", {
-                    "alert_message": alert.message,
-                    "response": response
-                }, "escalation_agent")
+    
+    async def _escalate(self, alert_message: str, system_status: str) -> Tuple[str, Union[str, Exception]]:
+        """Get an escalation response, reusing cached responses for repeated alerts.
+        
+        Returns the alert message with its response (or the exception raised) so results can be
+        matched up in completion order.
+        """
+        try:
+            response = await llm_cache.get_or_call(
+                ("escalation", alert_message, system_status),
+                lambda: llm_orchestrator.handle_escalation(alert_message, system_status)
+            )
+        except Exception as e:
+            return alert_message, e
+        return alert_message, response
     
     async def stop(self) -> None:
         self.running = False
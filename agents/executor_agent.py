@@ -7,9 +7,18 @@ from datetime import datetime
 from typing import Dict, Any
 
 from core.state import state_manager
-from core.logger import logger
+from core.logger import logger, fire_log
 
 
+# Action parameters: (max battery SOC change per cycle in %, fraction of load shifted)
+_ACTION_TABLE = {
+    "A": (10, 0.0),   # Charge battery
+    "B": (-10, 0.0),  # Discharge battery
+    "C": (0, 0.0),    # Use grid power
+    "D": (0, 0.2),    # Delay flexible load
+    "E": (-5, 0.0),   # Sell excess energy
+}
+
 class ExecutorAgent:
     """Reads decisions, mutates battery SOC, and schedules load shifts."""
     
@@ -45,18 +54,11 @@ class ExecutorAgent:
         grid_price = state.grid_price
         co2_intensity = state.co2_intensity
         # Simulate battery and load changes
-        soc_delta = 0
-        load_shifted = 0
-        if action == "A":  # Charge battery
-            soc_delta = min(10, 100 - battery_soc)  # Charge up to 10% per cycle
-        elif action == "B":  # Discharge battery
-            soc_delta = -min(10, battery_soc)  # Discharge up to 10% per cycle
-        elif action == "C":  # Use grid power
-            pass  # No change to battery
-        elif action == "D":  # Delay flexible load
-            load_shifted = min(20, load_kwh * 0.2)  # Shift up to 20% of load
-        elif action == "E":  # Sell excess energy
-            soc_delta = -min(5, battery_soc)  # Discharge a bit to sell
+        max_soc_delta, shift_fraction = _ACTION_TABLE.get(action, (0, 0.0))
+        soc_delta = max(-battery_soc, min(max_soc_delta, 100 - battery_soc))  # Clamp to 0-100% SOC
+        load_shifted = min(20, load_kwh * shift_fraction)  # Shift up to 20 kWh of load
+        if soc_delta == 0 and load_shifted == 0:
+            return  # Nothing changes, skip the state write
         # Update battery SOC and load
         new_battery_soc = max(0, min(100, battery_soc + soc_delta))
         new_load_kwh = max(0, load_kwh - load_shifted)
@@ -64,7 +66,7 @@ class ExecutorAgent:
             battery_soc=new_battery_soc,
             load_kwh=new_load_kwh
         )
-        await logger.log_event("executor_update", {
+        fire_log("executor_update", {
             "action": action,
             "battery_soc": new_battery_soc,
             "load_kwh": new_load_kwh,
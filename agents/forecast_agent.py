@@ -3,24 +3,32 @@ Forecast agent for predicting solar and load values.
 """
 
 import asyncio
+import math
+import random
+import zipfile
 import numpy as np
 from typing import Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
+from pathlib import Path
 from sklearn.linear_model import LinearRegression
 from sklearn.preprocessing import StandardScaler
-import joblib
 
 from core.state import state_manager
-from core.logger import logger
+from core.logger import logger, fire_log
 from utils.data_utils import RollingWindow
 
 
+# Time-based solar curve by hour: bell curve peaking at noon (sigma 3h), max 50 kWh, zero at night
+_SOLAR_CURVE = [50 * math.exp(-((hour - 12) ** 2) / (2 * 3 ** 2)) if 6 <= hour <= 18 else 0.0
+                for hour in range(24)]
+
 class ForecastAgent:
     """Forecasts solar and load values using rolling means and ML models."""
     
-    def __init__(self, update_interval: float = 60.0):
+    def __init__(self, update_interval: float = 60.0, model_file: Optional[str] = None):
         self.update_interval = update_interval
         self.running = False
+        self.model_file = model_file
         
         # Rolling windows for historical data
         self.solar_window = RollingWindow(window_size=24)
@@ -38,8 +46,19 @@ class ForecastAgent:
         self.solar_model_trained = False
         self.load_model_trained = False
         
+        # Cached scaler + linear model parameters for fast prediction
+        self._solar_mu = self._solar_sd = self._solar_w = None
+        self._solar_b = 0.0
+        self._load_mu = self._load_sd = self._load_w = None
+        self._load_b = 0.0
+        
         # Feature engineering
         self.feature_names = ['hour', 'day_of_week', 'is_business_hour', 'is_peak_hour']
+        self._feat_buf = np.empty(len(self.feature_names), dtype=np.float32)
+        
+        # Warm-start from previously saved model parameters
+        if model_file and Path(model_file).exists():
+            self.load_models(model_file)
     
     async def start(self) -> None:
         """Start the forecast agent."""
@@ -63,15 +82,17 @@ class ForecastAgent:
         """Update solar and load forecasts."""
         try:
             # Get current state
-            state = await state_manager.get_state()
+            state = await state_manager.get_snapshot()
             
             # Add current values to rolling windows
             self.solar_window.add_value(state.solar_kwh)
             self.load_window.add_value(state.load_kwh)
             
-            # Generate forecasts
-            solar_forecast = await self._forecast_solar()
-            load_forecast = await self._forecast_load()
+            # Generate forecasts from one feature vector per tick
+            now = datetime.now()
+            features = self._extract_features(now)
+            solar_forecast = await self._forecast_solar(features, now)
+            load_forecast = await self._forecast_load(features, now)
             
             # Update state with forecasts
             await state_manager.update_state(
@@ -80,65 +101,60 @@ class ForecastAgent:
             )
             
             # Log forecasts
-            await logger.log_event("forecast_updated", {
+            fire_log("forecast_updated", {
                 "solar_forecast": solar_forecast,
                 "load_forecast": load_forecast,
-                "solar_window_size": len(self.solar_window.data),
-                "load_window_size": len(self.load_window.data)
+                "solar_window_size": len(self.solar_window),
+                "load_window_size": len(self.load_window)
             }, "forecast_agent")
             
             # Train models if we have enough data
-            if len(self.solar_window.data) >= 12 and not self.solar_model_trained:
+            if len(self.solar_window) >= 12 and not self.solar_model_trained:
                 await self._train_solar_model()
             
-            if len(self.load_window.data) >= 12 and not self.load_model_trained:
+            if len(self.load_window) >= 12 and not self.load_model_trained:
                 await self._train_load_model()
             
         except Exception as e:
             await logger.log_error(f"Error updating forecasts: {e}", "forecast_agent", e)
     
-    async def _forecast_solar(self) -> float:
+    async def _forecast_solar(self, features: Optional[np.ndarray] = None,
+                              now: Optional[datetime] = None) -> float:
         """Forecast solar generation for the next hour."""
         if not self.solar_window.is_full():
             # Use simple time-based prediction if not enough data
-            return self._simple_solar_forecast()
+            return self._simple_solar_forecast(now)
         
         if self.solar_model_trained:
             # Use ML model for prediction
-            return await self._ml_solar_forecast()
+            return await self._ml_solar_forecast(features)
         else:
             # Use rolling mean with trend
             return self._rolling_mean_solar_forecast()
     
-    async def _forecast_load(self) -> float:
+    async def _forecast_load(self, features: Optional[np.ndarray] = None,
+                             now: Optional[datetime] = None) -> float:
         """Forecast load consumption for the next hour."""
         if not self.load_window.is_full():
             # Use simple time-based prediction if not enough data
-            return self._simple_load_forecast()
+            return self._simple_load_forecast(now)
         
         if self.load_model_trained:
             # Use ML model for prediction
-            return await self._ml_load_forecast()
+            return await self._ml_load_forecast(features)
         else:
             # Use rolling mean with trend
             return self._rolling_mean_load_forecast()
     
-    def _simple_solar_forecast(self) -> float:
+    def _simple_solar_forecast(self, now: Optional[datetime] = None) -> float:
         """Simple time-based solar forecast."""
-        current_hour = datetime.now().hour
-        
         # Solar generation follows a bell curve
-        if 6 <= current_hour <= 18:
-            peak_hour = 12
-            sigma = 3
-            factor = np.exp(-((current_hour - peak_hour) ** 2) / (2 * sigma ** 2))
-            return 50 * factor  # Max 50 kWh at peak
-        else:
-            return 0.0
+        now = now or datetime.now()
+        return _SOLAR_CURVE[now.hour]
     
-    def _simple_load_forecast(self) -> float:
+    def _simple_load_forecast(self, now: Optional[datetime] = None) -> float:
         """Simple time-based load forecast."""
-        current_hour = datetime.now().hour
+        current_hour = (now or datetime.now()).hour
         
         # Higher load during business hours
         if 8 <= current_hour <= 18:
@@ -147,7 +163,7 @@ class ForecastAgent:
             base_load = 60
         
         # Add some randomness
-        return base_load + np.random.normal(0, 10)
+        return base_load + random.gauss(0, 10)
     
     def _rolling_mean_solar_forecast(self) -> float:
         """Forecast solar using rolling mean and trend."""
@@ -171,12 +187,13 @@ class ForecastAgent:
         # Ensure reasonable range
         return max(20, min(200, forecast))
     
-    async def _ml_solar_forecast(self) -> float:
+    async def _ml_solar_forecast(self, features: Optional[np.ndarray] = None) -> float:
         """Forecast solar using trained ML model."""
         try:
-            features = self._extract_features()
-            features_scaled = self.solar_scaler.transform([features])
-            prediction = self.solar_model.predict(features_scaled)[0]
+            if features is None:
+                features = self._extract_features()
+            features_scaled = (features - self._solar_mu) / self._solar_sd
+            prediction = float(features_scaled @ self._solar_w) + self._solar_b
             
             # Ensure non-negative
             return max(0, prediction)
@@ -184,12 +201,13 @@ class ForecastAgent:
             await logger.log_error(f"ML solar forecast error: {e}", "forecast_agent", e)
             return self._rolling_mean_solar_forecast()
     
-    async def _ml_load_forecast(self) -> float:
+    async def _ml_load_forecast(self, features: Optional[np.ndarray] = None) -> float:
         """Forecast load using trained ML model."""
         try:
-            features = self._extract_features()
-            features_scaled = self.load_scaler.transform([features])
-            prediction = self.load_model.predict(features_scaled)[0]
+            if features is None:
+                features = self._extract_features()
+            features_scaled = (features - self._load_mu) / self._load_sd
+            prediction = float(features_scaled @ self._load_w) + self._load_b
             
             # Ensure reasonable range
             return max(20, min(200, prediction))
@@ -197,46 +215,37 @@ class ForecastAgent:
             await logger.log_error(f"ML load forecast error: {e}", "forecast_agent", e)
             return self._rolling_mean_load_forecast()
     
-    def _extract_features(self) -> np.ndarray:
-        """Extract features for ML prediction."""
-        current_time = datetime.now()
+    def _extract_features(self, now: Optional[datetime] = None) -> np.ndarray:
+        """Extract features for ML prediction into the reusable feature buffer."""
+        current_time = now or datetime.now()
         
         hour = current_time.hour
         day_of_week = current_time.weekday()
         is_business_hour = 1 if 8 <= hour <= 18 else 0
         is_peak_hour = 1 if 17 <= hour <= 21 else 0
         
-        return np.array([hour, day_of_week, is_business_hour, is_peak_hour])
+        self._feat_buf[:] = (hour, day_of_week, is_business_hour, is_peak_hour)
+        return self._feat_buf
     
     async def _train_solar_model(self) -> None:
         """Train the solar forecasting model."""
         try:
-            if len(self.solar_window.data) < 12:
+            if len(self.solar_window) < 12:
                 return
             
             # Prepare training data
-            X = []
-            y = []
-            
-            for i in range(len(self.solar_window.data) - 1):
-                features = self._extract_features_for_training(i)
-                X.append(features)
-                y.append(self.solar_window.data[i + 1])
-            
-            X = np.array(X)
-            y = np.array(y)
+            X = self._training_feature_matrix(len(self.solar_window) - 1)
+            y = self.solar_window.get_values()[1:]
             
-            # Scale features
-            X_scaled = self.solar_scaler.fit_transform(X)
-            
-            # Train model
-            self.solar_model.fit(X_scaled, y)
+            # Scale features and train model off the event loop
+            r2_score = await asyncio.to_thread(self._fit_model, self.solar_model, self.solar_scaler, X, y)
             self.solar_model_trained = True
+            self._cache_solar_params()
             
-            await logger.log_event("model_trained", {
+            fire_log("model_trained", {
                 "model": "solar",
                 "training_samples": len(X),
-                "r2_score": self.solar_model.score(X_scaled, y)
+                "r2_score": r2_score
             }, "forecast_agent")
             
         except Exception as e:
@@ -245,46 +254,58 @@ class ForecastAgent:
     async def _train_load_model(self) -> None:
         """Train the load forecasting model."""
         try:
-            if len(self.load_window.data) < 12:
+            if len(self.load_window) < 12:
                 return
             
             # Prepare training data
-            X = []
-            y = []
-            
-            for i in range(len(self.load_window.data) - 1):
-                features = self._extract_features_for_training(i)
-                X.append(features)
-                y.append(self.load_window.data[i + 1])
-            
-            X = np.array(X)
-            y = np.array(y)
+            X = self._training_feature_matrix(len(self.load_window) - 1)
+            y = self.load_window.get_values()[1:]
             
-            # Scale features
-            X_scaled = self.load_scaler.fit_transform(X)
-            
-            # Train model
-            self.load_model.fit(X_scaled, y)
+            # Scale features and train model off the event loop
+            r2_score = await asyncio.to_thread(self._fit_model, self.load_model, self.load_scaler, X, y)
             self.load_model_trained = True
+            self._cache_load_params()
             
-            await logger.log_event("model_trained", {
+            fire_log("model_trained", {
                 "model": "load",
                 "training_samples": len(X),
-                "r2_score": self.load_model.score(X_scaled, y)
+                "r2_score": r2_score
             }, "forecast_agent")
             
         except Exception as e:
             await logger.log_error(f"Error training load model: {e}", "forecast_agent", e)
     
-    def _extract_features_for_training(self, index: int) -> np.ndarray:
-        """Extract features for training at a specific time index."""
+    @staticmethod
+    def _fit_model(model: LinearRegression, scaler: StandardScaler, X: np.ndarray, y: np.ndarray) -> float:
+        """Fit scaler and model on the training data and return the R² score."""
+        X_scaled = scaler.fit_transform(X)
+        model.fit(X_scaled, y)
+        return model.score(X_scaled, y)
+    
+    def _cache_solar_params(self) -> None:
+        """Cache solar scaler and model parameters so prediction skips sklearn validation."""
+        self._solar_mu = self.solar_scaler.mean_.astype(np.float32)
+        self._solar_sd = self.solar_scaler.scale_.astype(np.float32)
+        self._solar_w = self.solar_model.coef_.astype(np.float32)
+        self._solar_b = float(self.solar_model.intercept_)
+    
+    def _cache_load_params(self) -> None:
+        """Cache load scaler and model parameters so prediction skips sklearn validation."""
+        self._load_mu = self.load_scaler.mean_.astype(np.float32)
+        self._load_sd = self.load_scaler.scale_.astype(np.float32)
+        self._load_w = self.load_model.coef_.astype(np.float32)
+        self._load_b = float(self.load_model.intercept_)
+    
+    def _training_feature_matrix(self, n_samples: int) -> np.ndarray:
+        """Build the feature matrix for time indices 0..n_samples-1 in one vectorized pass."""
         # Simulate time features for training
+        index = np.arange(n_samples)
         hour = index % 24
         day_of_week = (index // 24) % 7
-        is_business_hour = 1 if 8 <= hour <= 18 else 0
-        is_peak_hour = 1 if 17 <= hour <= 21 else 0
+        is_business_hour = (hour >= 8) & (hour <= 18)
+        is_peak_hour = (hour >= 17) & (hour <= 21)
         
-        return np.array([hour, day_of_week, is_business_hour, is_peak_hour])
+        return np.stack([hour, day_of_week, is_business_hour, is_peak_hour], axis=1).astype(np.float32)
     
     async def stop(self) -> None:
         """Stop the forecast agent."""
@@ -295,34 +316,68 @@ class ForecastAgent:
         return {
             "running": self.running,
             "update_interval": self.update_interval,
-            "solar_window_size": len(self.solar_window.data),
-            "load_window_size": len(self.load_window.data),
+            "solar_window_size": len(self.solar_window),
+            "load_window_size": len(self.load_window),
             "solar_model_trained": self.solar_model_trained,
             "load_model_trained": self.load_model_trained
         }
     
     def save_models(self, filepath: str) -> None:
-        """Save trained models to disk."""
+        """Save trained model parameters to disk as raw numpy arrays (.npz)."""
         if self.solar_model_trained or self.load_model_trained:
-            model_data = {
-                "solar_model": self.solar_model if self.solar_model_trained else None,
-                "load_model": self.load_model if self.load_model_trained else None,
-                "solar_scaler": self.solar_scaler if self.solar_model_trained else None,
-                "load_scaler": self.load_scaler if self.load_model_trained else None,
-                "solar_model_trained": self.solar_model_trained,
-                "load_model_trained": self.load_model_trained
-            }
-            joblib.dump(model_data, filepath)
+            model_data = {"trained": np.array([self.solar_model_trained, self.load_model_trained])}
+            if self.solar_model_trained:
+                model_data.update(mu_solar=self._solar_mu, sd_solar=self._solar_sd,
+                                  w_solar=self._solar_w, b_solar=np.array([self._solar_b]))
+            if self.load_model_trained:
+                model_data.update(mu_load=self._load_mu, sd_load=self._load_sd,
+                                  w_load=self._load_w, b_load=np.array([self._load_b]))
+            # np.savez would append .npz to a bare path, so write through a file object
+            with open(filepath, "wb") as f:
+                np.savez(f, **model_data)
+    
+    async def save_models_async(self, filepath: str) -> None:
+        """Save trained model parameters without blocking the event loop."""
+        await asyncio.to_thread(self.save_models, filepath)
     
     def load_models(self, filepath: str) -> None:
-        """Load trained models from disk."""
+        """Load trained model parameters from disk (.npz, or the older joblib format)."""
+        try:
+            # .npz files are zip archives; anything else was written by the joblib-based save_models
+            if not zipfile.is_zipfile(filepath):
+                self._load_joblib_models(filepath)
+                return
+            with np.load(filepath) as model_data:
+                self.solar_model_trained, self.load_model_trained = (bool(t) for t in model_data["trained"])
+                if self.solar_model_trained:
+                    self._solar_mu = model_data["mu_solar"].astype(np.float32)
+                    self._solar_sd = model_data["sd_solar"].astype(np.float32)
+                    self._solar_w = model_data["w_solar"].astype(np.float32)
+                    self._solar_b = float(model_data["b_solar"][0])
+                if self.load_model_trained:
+                    self._load_mu = model_data["mu_load"].astype(np.float32)
+                    self._load_sd = model_data["sd_load"].astype(np.float32)
+                    self._load_w = model_data["w_load"].astype(np.float32)
+                    self._load_b = float(model_data["b_load"][0])
+        except Exception as e:
+            print(f"Error loading models from {filepath}: {e}")
+    
+    def _load_joblib_models(self, filepath: str) -> None:
+        """Load fitted sklearn models saved by the joblib-based save_models and cache their parameters."""
+        import joblib  # Installed with scikit-learn; only needed for files in the old format
+        
         try:
             model_data = joblib.load(filepath)
-            self.solar_model = model_data.get("solar_model", LinearRegression())
-            self.load_model = model_data.get("load_model", LinearRegression())
-            self.solar_scaler = model_data.get("solar_scaler", StandardScaler())
-            self.load_scaler = model_data.get("load_scaler", StandardScaler())
-            self.solar_model_trained = model_data.get("solar_model_trained", False)
-            self.load_model_trained = model_data.get("load_model_trained", False)
         except Exception as e:
-            print(f"Error loading models: {e}") 
\ No newline at end of file
+            raise ValueError(f"not an .npz model file or a joblib model file from an older version ({e})") from e
+        
+        if model_data.get("solar_model_trained", False):
+            self.solar_model = model_data["solar_model"]
+            self.solar_scaler = model_data["solar_scaler"]
+            self._cache_solar_params()
+            self.solar_model_trained = True
+        if model_data.get("load_model_trained", False):
+            self.load_model = model_data["load_model"]
+            self.load_scaler = model_data["load_scaler"]
+            self._cache_load_params()
+            self.load_model_trained = True
@@ -3,20 +3,36 @@ Ingestion agent for streaming sensor data into the system.
 """
 
 import asyncio
-import pandas as pd
+import math
 import numpy as np
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional
-import random
 
 from core.state import state_manager, Alert
 from core.logger import logger
 from utils.data_utils import data_loader
 
 
+# Solar generation factor by hour: bell curve peaking at noon (sigma 3h), zero outside daylight hours
+_SOLAR_TIME_FACTORS = tuple(math.exp(-((hour - 12) ** 2) / (2 * 3 ** 2)) if 6 <= hour <= 18 else 0.0
+                            for hour in range(24))
+
+
 class IngestionAgent:
     """Streams sensor data from CSV files and updates the global state."""
     
+    # Columns read from each data file, with the value used when a column is missing
+    SENSOR_COLUMNS = {
+        'solar': {'solar_kwh': 0.0},
+        'load': {'load_kwh': 100.0, 'hvac_kwh': 30.0, 'lighting_kwh': 20.0, 'machines_kwh': 50.0},
+        'price': {'grid_price_eur_kwh': 0.15, 'co2_intensity_g_kwh': 400.0}
+    }
+    
+    # Number of ticks in one simulated day
+    CYCLE_LENGTH = 24
+    
+    _ALERT_SOURCE = "ingestion_agent"
+    
     def __init__(self, update_interval: float = 1.0):
         self.update_interval = update_interval
         self.running = False
@@ -26,19 +42,66 @@ class IngestionAgent:
             'load': 'load_data.csv',
             'price': 'price_data.csv'
         }
-        self.data_cache: Dict[str, pd.DataFrame] = {}
+        self.data_arrays: Dict[str, Dict[str, np.ndarray]] = {}
+        self._day_values: Dict[str, Dict[str, np.ndarray]] = {}
+        self._rng = np.random.default_rng()
         self._load_data()
+        self._prepare_day()
     
     def _load_data(self) -> None:
-        """Load all data files into cache."""
+        """Load all data files as per-column arrays."""
         for data_type, filename in self.data_files.items():
             try:
-                self.data_cache[data_type] = data_loader.load_csv(filename)
-                print(f"Loaded {data_type} data: {len(self.data_cache[data_type])} records")
+                df = data_loader.load_csv(filename, usecols=list(self.SENSOR_COLUMNS[data_type]))
+                print(f"Loaded {data_type} data: {len(df)} records")
             except Exception as e:
                 print(f"Error loading {data_type} data: {e}")
-                # Create empty DataFrame as fallback
-                self.data_cache[data_type] = pd.DataFrame()
+                continue
+            
+            if df.empty:
+                continue
+            
+            # Keep only the columns we read, as float arrays for cheap per-tick indexing
+            self.data_arrays[data_type] = {
+                col: (df[col].to_numpy(dtype=np.float32) if col in df.columns
+                      else np.full(len(df), default, dtype=np.float32))
+                for col, default in self.SENSOR_COLUMNS[data_type].items()
+            }
+    
+    def _prepare_day(self) -> None:
+        """Precompute a whole simulated day of noisy sensor readings and anomaly flags."""
+        n = self.CYCLE_LENGTH
+        # One batched draw per noise band: solar/load 5%, price 2%, CO2 10%
+        solar_noise, load_noise = self._rng.uniform(0.95, 1.05, (2, n))
+        noise = {
+            'solar_kwh': solar_noise * np.asarray(_SOLAR_TIME_FACTORS),
+            'load_kwh': load_noise,  # Shared by all load components
+            'hvac_kwh': load_noise,
+            'lighting_kwh': load_noise,
+            'machines_kwh': load_noise,
+            'grid_price_eur_kwh': self._rng.uniform(0.98, 1.02, n),
+            'co2_intensity_g_kwh': self._rng.uniform(0.9, 1.1, n)
+        }
+        
+        # Ticks beyond the end of the data fall back to the default values
+        self._day_values = {}
+        for data_type, columns in self.SENSOR_COLUMNS.items():
+            arrays = self.data_arrays.get(data_type, {})
+            day = {}
+            for col, default in columns.items():
+                values = np.full(n, default, dtype=np.float32)
+                if col in arrays:
+                    m = min(n, len(arrays[col]))
+                    values[:m] = arrays[col][:m] * noise[col][:m]
+                day[col] = values
+            self._day_values[data_type] = day
+        
+        solar = self._day_values['solar']['solar_kwh']
+        np.maximum(solar, 0, out=solar)
+        hours = np.arange(n)
+        self._load_anomaly = self._day_values['load']['load_kwh'] > 200  # Threshold for high load
+        self._price_anomaly = self._day_values['price']['grid_price_eur_kwh'] > 0.25  # Threshold for high price
+        self._solar_anomaly = (hours >= 8) & (hours <= 16) & (solar == 0)  # No solar in daylight
     
     async def start(self) -> None:
         """Start the ingestion agent."""
@@ -47,9 +110,18 @@ class IngestionAgent:
         print("Ingestion agent started")
         
         try:
+            # Sleep to fixed deadlines so processing time doesn't accumulate as drift
+            loop = asyncio.get_running_loop()
+            next_tick = loop.time()
             while self.running:
                 await self._process_data()
-                await asyncio.sleep(self.update_interval)
+                next_tick += self.update_interval
+                delay = next_tick - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    # Fell behind; restart the schedule rather than bursting to catch up
+                    next_tick = loop.time()
         except asyncio.CancelledError:
             print("Ingestion agent cancelled")
         except Exception as e:
@@ -62,164 +134,75 @@ class IngestionAgent:
         """Process and update sensor data."""
         try:
             # Get current data for all sensors
-            solar_data = await self._get_current_sensor_data('solar')
-            load_data = await self._get_current_sensor_data('load')
-            price_data = await self._get_current_sensor_data('price')
-            
-            # Update global state
-            await state_manager.update_state(
-                solar_kwh=solar_data.get('solar_kwh', 0.0),
-                load_kwh=load_data.get('load_kwh', 0.0),
-                grid_price=price_data.get('grid_price_eur_kwh', 0.15),
-                co2_intensity=price_data.get('co2_intensity_g_kwh', 400.0)
+            solar_data, load_data, price_data = await asyncio.gather(
+                self._get_current_sensor_data('solar'),
+                self._get_current_sensor_data('load'),
+                self._get_current_sensor_data('price')
             )
             
-            # Log the update
-            await logger.log_state_change({
-                "solar_kwh": solar_data.get('solar_kwh', 0.0),
-                "load_kwh": load_data.get('load_kwh', 0.0),
-                "grid_price": price_data.get('grid_price_eur_kwh', 0.15),
-                "co2_intensity": price_data.get('co2_intensity_g_kwh', 400.0)
-            }, "ingestion_agent")
+            # Sensor readings always carry every key (real or fallback data)
+            payload = {
+                "solar_kwh": solar_data['solar_kwh'],
+                "load_kwh": load_data['load_kwh'],
+                "grid_price": price_data['grid_price_eur_kwh'],
+                "co2_intensity": price_data['co2_intensity_g_kwh']
+            }
+            
+            # Update global state and log the update; neither depends on the other
+            await asyncio.gather(
+                state_manager.update_state(**payload),
+                logger.log_state_change(payload, "ingestion_agent")
+            )
             
             # Check for anomalies
             await self._check_anomalies(solar_data, load_data, price_data)
             
-            # Move to next time step
-            self.current_time_index = (self.current_time_index + 1) % 24
+            # Move to next time step, drawing fresh noise for each new day
+            self.current_time_index = (self.current_time_index + 1) % self.CYCLE_LENGTH
+            if self.current_time_index == 0:
+                self._prepare_day()
             
         except Exception as e:
             await logger.log_error(f"Error processing data: {e}", "ingestion_agent", e)
     
     async def _get_current_sensor_data(self, data_type: str) -> Dict[str, float]:
         """Get current sensor data for a specific type."""
-        if data_type not in self.data_cache or self.data_cache[data_type].empty:
+        day = self._day_values.get(data_type)
+        if day is None:
             return self._get_fallback_data(data_type)
         
-        df = self.data_cache[data_type]
-        
-        # Get data for current time index
-        if self.current_time_index < len(df):
-            row = df.iloc[self.current_time_index]
-            
-            # Add some realistic noise
-            noise_factor = 0.05  # 5% noise
-            
-            if data_type == 'solar':
-                solar_kwh = row.get('solar_kwh', 0.0)
-                # Add time-based variation and noise
-                time_factor = self._get_solar_time_factor()
-                noise = random.uniform(1 - noise_factor, 1 + noise_factor)
-                return {
-                    'solar_kwh': max(0, solar_kwh * time_factor * noise)
-                }
-            
-            elif data_type == 'load':
-                load_kwh = row.get('load_kwh', 100.0)
-                hvac_kwh = row.get('hvac_kwh', 30.0)
-                lighting_kwh = row.get('lighting_kwh', 20.0)
-                machines_kwh = row.get('machines_kwh', 50.0)
-                
-                # Add noise to each component
-                noise = random.uniform(1 - noise_factor, 1 + noise_factor)
-                return {
-                    'load_kwh': load_kwh * noise,
-                    'hvac_kwh': hvac_kwh * noise,
-                    'lighting_kwh': lighting_kwh * noise,
-                    'machines_kwh': machines_kwh * noise
-                }
-            
-            elif data_type == 'price':
-                grid_price = row.get('grid_price_eur_kwh', 0.15)
-                co2_intensity = row.get('co2_intensity_g_kwh', 400.0)
-                
-                # Add small noise to price and CO2
-                price_noise = random.uniform(1 - 0.02, 1 + 0.02)  # 2% noise for price
-                co2_noise = random.uniform(1 - 0.1, 1 + 0.1)  # 10% noise for CO2
-                
-                return {
-                    'grid_price_eur_kwh': grid_price * price_noise,
-                    'co2_intensity_g_kwh': co2_intensity * co2_noise
-                }
-        
-        return self._get_fallback_data(data_type)
+        idx = self.current_time_index
+        return {col: float(values[idx]) for col, values in day.items()}
     
     def _get_fallback_data(self, data_type: str) -> Dict[str, float]:
         """Get fallback data when CSV data is not available."""
-        if data_type == 'solar':
-            return {'solar_kwh': 0.0}
-        elif data_type == 'load':
-            return {
-                'load_kwh': 100.0,
-                'hvac_kwh': 30.0,
-                'lighting_kwh': 20.0,
-                'machines_kwh': 50.0
-            }
-        elif data_type == 'price':
-            return {
-                'grid_price_eur_kwh': 0.15,
-                'co2_intensity_g_kwh': 400.0
-            }
-        return {}
-    
-    def _get_solar_time_factor(self) -> float:
-        """Get time-based factor for solar generation (0-1)."""
-        hour = self.current_time_index
-        # Solar generation follows a bell curve, peak at hour 12 (noon)
-        if 6 <= hour <= 18:  # Daylight hours
-            # Bell curve centered at hour 12
-            peak_hour = 12
-            sigma = 3  # Standard deviation
-            factor = np.exp(-((hour - peak_hour) ** 2) / (2 * sigma ** 2))
-            return factor
-        else:
-            return 0.0  # No solar generation at night
+        return dict(self.SENSOR_COLUMNS.get(data_type, {}))
     
     async def _check_anomalies(self, solar_data: Dict[str, float], 
                              load_data: Dict[str, float], 
                              price_data: Dict[str, float]) -> None:
         """Check for anomalies in sensor data."""
+        idx = self.current_time_index
+        
         # Check for unusually high load
-        load_kwh = load_data.get('load_kwh', 0.0)
-        if load_kwh > 200:  # Threshold for high load
-            alert = Alert(
-                level="warning",
-                message=f"High load detected: {load_kwh:.1f} kWh",
-                timestamp=datetime.now(),
-                source="ingestion_agent"
-            )
-            await state_manager.add_alert(alert)
-            await logger.log_alert({
-                "level": "warning",
-                "message": f"High load detected: {load_kwh:.1f} kWh"
-            }, "ingestion_agent")
+        if self._load_anomaly[idx]:
+            load_kwh = load_data.get('load_kwh', 0.0)
+            await self._emit_alert("warning", f"High load detected: {load_kwh:.1f} kWh")
         
         # Check for unusually high grid price
-        grid_price = price_data.get('grid_price_eur_kwh', 0.15)
-        if grid_price > 0.25:  # Threshold for high price
-            alert = Alert(
-                level="warning",
-                message=f"High grid price detected: €{grid_price:.3f}/kWh",
-                timestamp=datetime.now(),
-                source="ingestion_agent"
-            )
-            await state_manager.add_alert(alert)
-            await logger.log_alert({
-                "level": "warning",
-                "message": f"High grid price detected: €{grid_price:.3f}/kWh"
-            }, "ingestion_agent")
+        if self._price_anomaly[idx]:
+            grid_price = price_data.get('grid_price_eur_kwh', 0.15)
+            await self._emit_alert("warning", f"High grid price detected: €{grid_price:.3f}/kWh")
         
         # Check for zero solar generation during daylight hours
-        solar_kwh = solar_data.get('solar_kwh', 0.0)
-        hour = self.current_time_index
-        if 8 <= hour <= 16 and solar_kwh == 0:
-            alert = Alert(
-                level="info",
-                message="No solar generation during daylight hours - possible equipment issue",
-                timestamp=datetime.now(),
-                source="ingestion_agent"
-            )
-            await state_manager.add_alert(alert)
+        if self._solar_anomaly[idx]:
+            await self._emit_alert("info", "No solar generation during daylight hours - possible equipment issue")
+    
+    async def _emit_alert(self, level: str, message: str) -> None:
+        """Raise an alert in the global state and log it."""
+        alert = Alert(level=level, message=message, timestamp=datetime.now(), source=self._ALERT_SOURCE)
+        await state_manager.add_alert(alert)
+        await logger.log_alert({"level": level, "message": message}, self._ALERT_SOURCE)
     
     async def stop(self) -> None:
         """Stop the ingestion agent."""
@@ -231,5 +214,5 @@ class IngestionAgent:
             "running": self.running,
             "current_time_index": self.current_time_index,
             "update_interval": self.update_interval,
-            "data_files_loaded": list(self.data_cache.keys())
+            "data_files_loaded": list(self.data_arrays.keys())
         } 
\ No newline at end of file
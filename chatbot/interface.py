@@ -3,44 +3,123 @@ Streamlit chatbot interface for the decarbonization AI system.
 """
 
 import streamlit as st
+import asyncio
+import copy
 import numpy as np
 from datetime import datetime
 import random
+import re
 import os
 import sys
+from functools import lru_cache
+from dotenv import load_dotenv
 
 # Add project root to path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-# Try to import core modules, but don't fail if they're not available
-GEMINI_AVAILABLE = False
-try:
-    # Import with error handling
-    from utils.gemini import llm_orchestrator
-    from core.state import state_manager
-    from core.logger import logger
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.append(_PROJECT_ROOT)
+
+_ENV_FILE = os.path.join(_PROJECT_ROOT, ".env")
+
+# Core modules (and the Gemini SDK) are imported on the first real AI call, so demo mode
+# never pays for them. None means no import has been attempted yet.
+GEMINI_AVAILABLE = None
+IMPORT_ERROR = None
+
+
+@lru_cache(maxsize=1)
+def _load_core():
+    """Import the core modules once; returns the llm_orchestrator, or None if they failed to import."""
+    global GEMINI_AVAILABLE, IMPORT_ERROR
+    try:
+        from utils.gemini import llm_orchestrator
+    except Exception as e:
+        GEMINI_AVAILABLE = False
+        # Store the error message to display later
+        IMPORT_ERROR = str(e)
+        return None
     GEMINI_AVAILABLE = True
-except Exception as e:
-    GEMINI_AVAILABLE = False
-    # Store the error message to display later
-    IMPORT_ERROR = str(e)
+    return llm_orchestrator
+
+
+# Static mock responses
+_SAVINGS_RESPONSE = """**Today's Energy Savings:**
+- Solar Generation: 45.2 kWh
+- Grid Consumption: 23.8 kWh
+- Cost Savings: €3.45
+- CO₂ Reduction: 12.3 kg
+
+Your solar panels are performing well today!"""
+
+_UPGRADE_RESPONSE = """**Infrastructure Recommendations:**
+1. **Solar Panel Expansion** (€15,000)
+   - Annual Savings: €2,500
+   - ROI: 6.0 years
+   - CO₂ Reduction: 5,000 kg/year
+
+2. **Battery Storage Upgrade** (€8,000)
+   - Annual Savings: €1,200  
+   - ROI: 6.7 years
+   - CO₂ Reduction: 2,000 kg/year
+
+3. **Smart Thermostat** (€300)
+   - Annual Savings: €180
+   - ROI: 1.7 years
+   - CO₂ Reduction: 400 kg/year"""
+
+_OPTIMIZE_RESPONSE = """**Energy Optimization Tips:**
+1. **Load Shifting**: Move high-power activities to solar peak hours (10 AM - 4 PM)
+2. **Battery Management**: Charge during low-price periods, discharge during peak
+3. **Smart Scheduling**: Use timers for appliances to match solar generation
+4. **Efficiency Upgrades**: Consider LED lighting and energy-efficient appliances
+5. **Monitoring**: Track usage patterns to identify optimization opportunities"""
+
+_CO2_RESPONSE = """**Today's CO₂ Impact:**
+- Total CO₂ Emissions: 8.7 kg
+- CO₂ Avoided (Solar): 12.3 kg
+- Net CO₂ Impact: -3.6 kg (Carbon Negative!)
+- Monthly Trend: 15% reduction vs last month
+
+Your system is actively contributing to decarbonization! 🌱"""
+
+_HELP_RESPONSE = """I'm here to help with your energy management questions! 
+
+You can ask me about:
+- Current energy status
+- Daily savings and efficiency
+- AI decisions and recommendations  
+- Infrastructure upgrade options
+- Energy optimization tips
+- CO₂ impact and sustainability
+
+This is a demo version. Add your Gemini API key to enable full AI functionality!"""
 
 
 def get_mock_system_state():
-    """Generate mock system state for demonstration."""
-    current_time = datetime.now()
-    hour = current_time.hour
+    """Generate mock system state for demonstration (changes once per hour)."""
+    now = datetime.now()
+    # A copy, so callers can't alter the cached state other reruns will see
+    return copy.deepcopy(_mock_system_state_for_hour(now.toordinal(), now.hour))
+
+
+@lru_cache(maxsize=24)
+def _mock_system_state_for_hour(day: int, hour: int):
+    """Build the mock system state for an hour of a day, with noise seeded by both."""
+    rng = random.Random(day * 24 + hour)
     
     solar_kwh = max(0, 25 * np.sin(np.pi * (hour - 6) / 12)) if 6 <= hour <= 18 else 0
-    load_kwh = 50 + 30 * np.sin(np.pi * hour / 12) + random.uniform(-10, 10)
-    battery_soc = 60 + random.uniform(-5, 5)
-    grid_price = 0.15 + 0.05 * np.sin(np.pi * hour / 12) + random.uniform(-0.02, 0.02)
+    load_kwh = 50 + 30 * np.sin(np.pi * hour / 12) + rng.uniform(-10, 10)
+    battery_soc = 60 + rng.uniform(-5, 5)
+    grid_price = 0.15 + 0.05 * np.sin(np.pi * hour / 12) + rng.uniform(-0.02, 0.02)
+    co2_intensity = 400 + rng.uniform(-50, 50)
     
     return {
         'solar_kwh': max(0, solar_kwh),
         'load_kwh': max(10, load_kwh),
         'battery_soc': max(0, min(100, battery_soc)),
         'grid_price': max(0.05, grid_price),
+        'co2_intensity': co2_intensity,
+        'system_status': 'running',
         'current_decision': {
             'action': 'Charge battery from solar',
             'explanation': 'Solar generation exceeds load, storing excess energy'
@@ -48,34 +127,41 @@ def get_mock_system_state():
     }
 
 
+def _gemini_key_set() -> bool:
+    """Whether a real GEMINI_API_KEY is set, in the environment or in the project's .env."""
+    load_dotenv(_ENV_FILE)
+    api_key = os.getenv('GEMINI_API_KEY')
+    return bool(api_key) and api_key != 'your_gemini_api_key_here'
+
+
 def get_real_ai_response(user_message: str) -> str:
     """Get real AI response using Gemini."""
     try:
-        if not GEMINI_AVAILABLE:
+        if not _gemini_key_set():
             return get_mock_ai_response(user_message)
         
-        # Check if API key is set
-        api_key = os.getenv('GEMINI_API_KEY')
-        if not api_key or api_key == 'your_gemini_api_key_here':
+        llm_orchestrator = _load_core()
+        if llm_orchestrator is None:
             return get_mock_ai_response(user_message)
         
-        # Get current system state for context
-        try:
-            state = state_manager.get_state()
-            context = f"""
-            Current System State:
-            - Solar Generation: {state.solar_kwh:.1f} kWh
-            - Load Consumption: {state.load_kwh:.1f} kWh
-            - Battery SOC: {state.battery_soc:.1f}%
-            - Grid Price: €{state.grid_price:.3f}/kWh
-            - CO₂ Intensity: {state.co2_intensity:.0f} g/kWh
-            - System Status: {state.system_status}
-            """
-        except:
-            context = "System state unavailable"
+        # Give the assistant the same system state the sidebar shows
+        state = get_mock_system_state()
+        prompt = f"""Current System State:
+- Solar Generation: {state['solar_kwh']:.1f} kWh
+- Load Consumption: {state['load_kwh']:.1f} kWh
+- Battery SOC: {state['battery_soc']:.1f}%
+- Grid Price: €{state['grid_price']:.3f}/kWh
+- CO₂ Intensity: {state['co2_intensity']:.0f} g/kWh
+- System Status: {state['system_status']}
+
+User question: {user_message}"""
         
-        # Get AI response
-        response = llm_orchestrator.chat_response(user_message, context)
+        # Drive the async chat call on a private loop (Streamlit runs this script synchronously)
+        loop = asyncio.new_event_loop()
+        try:
+            response = loop.run_until_complete(llm_orchestrator.chat_response(prompt))
+        finally:
+            loop.close()
         
         if response and response.strip():
             return response
@@ -87,84 +173,64 @@ def get_real_ai_response(user_message: str) -> str:
         return get_mock_ai_response(user_message)
 
 
-def get_mock_ai_response(user_message: str) -> str:
-    """Generate mock AI responses for demonstration."""
-    message_lower = user_message.lower()
-    
-    if "energy status" in message_lower or "current" in message_lower:
-        state = get_mock_system_state()
-        return f"""**Current Energy Status:**
+def _status_response() -> str:
+    state = get_mock_system_state()
+    return f"""**Current Energy Status:**
 - Solar Generation: {state['solar_kwh']:.1f} kWh
 - Load Consumption: {state['load_kwh']:.1f} kWh  
 - Battery SOC: {state['battery_soc']:.1f}%
 - Grid Price: €{state['grid_price']:.3f}/kWh
 
 The system is operating normally with solar generation providing {state['solar_kwh']/state['load_kwh']*100:.1f}% of current load."""
-    
-    elif "savings" in message_lower:
-        return """**Today's Energy Savings:**
-- Solar Generation: 45.2 kWh
-- Grid Consumption: 23.8 kWh
-- Cost Savings: €3.45
-- CO₂ Reduction: 12.3 kg
 
-Your solar panels are performing well today!"""
-    
-    elif "ai decisions" in message_lower or "decisions" in message_lower:
-        state = get_mock_system_state()
-        return f"""**Latest AI Decision:**
+
+def _decisions_response() -> str:
+    state = get_mock_system_state()
+    return f"""**Latest AI Decision:**
 **Action**: {state['current_decision']['action']}
 **Explanation**: {state['current_decision']['explanation']}
 **Confidence**: 85%
 
 The AI is actively managing your energy system for optimal efficiency."""
-    
-    elif "upgrade" in message_lower or "infrastructure" in message_lower:
-        return """**Infrastructure Recommendations:**
-1. **Solar Panel Expansion** (€15,000)
-   - Annual Savings: €2,500
-   - ROI: 6.0 years
-   - CO₂ Reduction: 5,000 kg/year
 
-2. **Battery Storage Upgrade** (€8,000)
-   - Annual Savings: €1,200  
-   - ROI: 6.7 years
-   - CO₂ Reduction: 2,000 kg/year
 
-3. **Smart Thermostat** (€300)
-   - Annual Savings: €180
-   - ROI: 1.7 years
-   - CO₂ Reduction: 400 kg/year"""
-    
-    elif "optimize" in message_lower or "efficiency" in message_lower:
-        return """**Energy Optimization Tips:**
-1. **Load Shifting**: Move high-power activities to solar peak hours (10 AM - 4 PM)
-2. **Battery Management**: Charge during low-price periods, discharge during peak
-3. **Smart Scheduling**: Use timers for appliances to match solar generation
-4. **Efficiency Upgrades**: Consider LED lighting and energy-efficient appliances
-5. **Monitoring**: Track usage patterns to identify optimization opportunities"""
-    
-    elif "co2" in message_lower or "carbon" in message_lower:
-        return """**Today's CO₂ Impact:**
-- Total CO₂ Emissions: 8.7 kg
-- CO₂ Avoided (Solar): 12.3 kg
-- Net CO₂ Impact: -3.6 kg (Carbon Negative!)
-- Monthly Trend: 15% reduction vs last month
+# Mock responses by intent, in priority order
+_MOCK_RESPONSES = {
+    "status": _status_response,
+    "savings": _SAVINGS_RESPONSE,
+    "decisions": _decisions_response,
+    "upgrade": _UPGRADE_RESPONSE,
+    "optimize": _OPTIMIZE_RESPONSE,
+    "co2": _CO2_RESPONSE,
+}
 
-Your system is actively contributing to decarbonization! 🌱"""
-    
-    else:
-        return """I'm here to help with your energy management questions! 
+# One named group of keywords per intent, matched in a single scan of the message
+_INTENT_RE = re.compile(
+    r"(?P<status>energy status|current)"
+    r"|(?P<savings>savings)"
+    r"|(?P<decisions>decisions)"
+    r"|(?P<upgrade>upgrade|infrastructure)"
+    r"|(?P<optimize>optimize|efficiency)"
+    r"|(?P<co2>co2|carbon)",
+    re.IGNORECASE
+)
+_INTENT_PRIORITY = {intent: rank for rank, intent in enumerate(_MOCK_RESPONSES)}
 
-You can ask me about:
-- Current energy status
-- Daily savings and efficiency
-- AI decisions and recommendations  
-- Infrastructure upgrade options
-- Energy optimization tips
-- CO₂ impact and sustainability
 
-This is a demo version. Add your Gemini API key to enable full AI functionality!"""
+def get_mock_ai_response(user_message: str) -> str:
+    """Generate mock AI responses for demonstration."""
+    # The highest-priority intent with a keyword anywhere in the message wins, not the leftmost keyword
+    intent = None
+    for match in _INTENT_RE.finditer(user_message):
+        if intent is None or _INTENT_PRIORITY[match.lastgroup] < _INTENT_PRIORITY[intent]:
+            intent = match.lastgroup
+            if _INTENT_PRIORITY[intent] == 0:
+                break
+    if intent is None:
+        return _HELP_RESPONSE
+    
+    response = _MOCK_RESPONSES[intent]
+    return response() if callable(response) else response
 
 
 def init_chat_session():
@@ -195,7 +261,7 @@ def main():
     )
     
     # Display import warning if needed
-    if not GEMINI_AVAILABLE:
+    if GEMINI_AVAILABLE is False:
         st.warning(f"⚠️ Core modules not available: {IMPORT_ERROR}. Running in demo mode.")
     
     st.title("💬 Decarbon AI Assistant")
@@ -3,193 +3,306 @@ Chat memory management for the decarbonization AI system.
 """
 
 import asyncio
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+import re
+import time
+from collections import deque
+from itertools import islice
+from types import MappingProxyType
+from typing import Callable, Deque, List, Dict, Any, Mapping, Optional, Set
+from datetime import datetime, timedelta
 from dataclasses import dataclass
 import json
+import orjson
 
+# Stream conversation imports with ijson when available
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
-@dataclass
+
+@dataclass(slots=True)
 class ChatMessage:
     """Represents a single chat message."""
-    timestamp: datetime
+    timestamp: float  # Unix time, formatted to ISO only on export
     sender: str  # "user" or "assistant"
     message: str
     context: Optional[Dict[str, Any]] = None
 
 
 class ChatMemory:
-    """Manages chat conversation history and context."""
+    """Manages chat conversation history and context.
+    
+    Mutations happen only inside _lock. Reads don't await, so on a single event loop they
+    see a consistent deque and skip the lock; snapshot with list(self.messages) if a read
+    ever needs stability across an await.
+    """
     
     def __init__(self, max_messages: int = 50):
         self.max_messages = max_messages
-        self.messages: List[ChatMessage] = []
+        self.messages: Deque[ChatMessage] = deque(maxlen=max_messages)
         self._lock = asyncio.Lock()
+        self._reset_stats()
+        self._reset_index()
+    
+    def _reset_stats(self) -> None:
+        """Reset the running message statistics."""
+        self._user_count = 0
+        self._assistant_count = 0
+        self._total_chars = 0
+    
+    def _update_stats(self, msg: ChatMessage, sign: int) -> None:
+        """Add (sign=1) or remove (sign=-1) a message from the running statistics."""
+        self._user_count += sign * (msg.sender == "user")
+        self._assistant_count += sign * (msg.sender == "assistant")
+        self._total_chars += sign * len(msg.message)
+    
+    def _reset_index(self) -> None:
+        """Reset the search index."""
+        self._index: Dict[str, Set[int]] = {}  # Token -> ids of messages containing it
+        self._by_id: Dict[int, ChatMessage] = {}  # Insertion ordered, oldest first
+        self._next_id = 0
+    
+    def _index_message(self, msg: ChatMessage) -> None:
+        """Add a message to the search index."""
+        msg_id = self._next_id
+        self._next_id += 1
+        self._by_id[msg_id] = msg
+        for token in set(re.findall(r"\w+", msg.message.lower())):
+            self._index.setdefault(token, set()).add(msg_id)
+    
+    def _unindex_oldest(self) -> None:
+        """Remove the oldest message from the search index."""
+        msg_id = next(iter(self._by_id))
+        msg = self._by_id.pop(msg_id)
+        for token in set(re.findall(r"\w+", msg.message.lower())):
+            postings = self._index[token]
+            postings.discard(msg_id)
+            if not postings:
+                del self._index[token]
+    
+    def _append(self, msg: ChatMessage) -> None:
+        """Append a message, keeping the running statistics and index in sync with evictions."""
+        # The deque drops the oldest message once max_messages is reached
+        if len(self.messages) == self.messages.maxlen:
+            self._update_stats(self.messages[0], -1)
+            self._unindex_oldest()
+        self.messages.append(msg)
+        self._update_stats(msg, 1)
+        self._index_message(msg)
     
     async def add_message(self, sender: str, message: str, context: Optional[Dict[str, Any]] = None) -> None:
         """Add a new message to the conversation history."""
         async with self._lock:
             chat_message = ChatMessage(
-                timestamp=datetime.now(),
+                timestamp=time.time(),
                 sender=sender,
                 message=message,
                 context=context
             )
             
-            self.messages.append(chat_message)
-            
-            # Keep only the most recent messages
-            if len(self.messages) > self.max_messages:
-                self.messages = self.messages[-self.max_messages:]
+            self._append(chat_message)
     
     async def get_recent_messages(self, count: int = 10) -> List[ChatMessage]:
         """Get the most recent messages."""
-        async with self._lock:
-            return self.messages[-count:] if self.messages else []
+        return self._tail(count)
+    
+    def _tail(self, count: int) -> List[ChatMessage]:
+        """Get the last count messages, oldest first."""
+        return list(islice(self.messages, max(0, len(self.messages) - count), None))
+    
+    def _duration(self) -> timedelta:
+        """Time between the oldest and newest message."""
+        return timedelta(seconds=self.messages[-1].timestamp - self.messages[0].timestamp)
     
     async def get_conversation_summary(self) -> str:
         """Get a summary of the conversation."""
-        async with self._lock:
-            if not self.messages:
-                return "No conversation history."
-            
-            user_messages = [msg.message for msg in self.messages if msg.sender == "user"]
-            assistant_messages = [msg.message for msg in self.messages if msg.sender == "assistant"]
-            
-            summary = f"Conversation summary:\n"
-            summary += f"- Total messages: {len(self.messages)}\n"
-            summary += f"- User messages: {len(user_messages)}\n"
-            summary += f"- Assistant messages: {len(assistant_messages)}\n"
-            summary += f"- Duration: {self.messages[-1].timestamp - self.messages[0].timestamp}\n"
-            
-            return summary
+        if not self.messages:
+            return "No conversation history."
+        
+        summary = f"Conversation summary:\n"
+        summary += f"- Total messages: {len(self.messages)}\n"
+        summary += f"- User messages: {self._user_count}\n"
+        summary += f"- Assistant messages: {self._assistant_count}\n"
+        summary += f"- Duration: {self._duration()}\n"
+        
+        return summary
     
     async def get_context_for_llm(self, max_context_messages: int = 5) -> str:
         """Get formatted conversation context for LLM."""
-        async with self._lock:
-            recent_messages = self.messages[-max_context_messages:] if self.messages else []
-            
-            if not recent_messages:
-                return ""
-            
-            context = "Recent conversation:\n"
-            for msg in recent_messages:
-                role = "User" if msg.sender == "user" else "Assistant"
-                context += f"{role}: {msg.message}\n"
-            
-            return context
+        recent_messages = self._tail(max_context_messages)
+        
+        if not recent_messages:
+            return ""
+        
+        context = "Recent conversation:\n"
+        for msg in recent_messages:
+            role = "User" if msg.sender == "user" else "Assistant"
+            context += f"{role}: {msg.message}\n"
+        
+        return context
     
     async def clear_memory(self) -> None:
         """Clear all conversation history."""
         async with self._lock:
             self.messages.clear()
+            self._reset_stats()
+            self._reset_index()
     
     async def export_conversation(self, filename: str) -> None:
         """Export conversation to a JSON file."""
-        async with self._lock:
-            conversation_data = {
-                "export_timestamp": datetime.now().isoformat(),
-                "total_messages": len(self.messages),
-                "messages": [
-                    {
-                        "timestamp": msg.timestamp.isoformat(),
-                        "sender": msg.sender,
-                        "message": msg.message,
-                        "context": msg.context
-                    }
-                    for msg in self.messages
-                ]
-            }
-            
-            with open(filename, 'w') as f:
-                json.dump(conversation_data, f, indent=2)
+        conversation_data = {
+            "export_timestamp": datetime.now(),
+            "total_messages": len(self.messages),
+            "messages": [
+                {
+                    "timestamp": datetime.fromtimestamp(msg.timestamp),
+                    "sender": msg.sender,
+                    "message": msg.message,
+                    "context": msg.context
+                }
+                for msg in self.messages
+            ]
+        }
+        
+        # orjson writes datetimes as ISO strings; default=str covers arbitrary context values
+        with open(filename, 'wb') as f:
+            f.write(orjson.dumps(conversation_data, option=orjson.OPT_INDENT_2, default=str))
     
     async def import_conversation(self, filename: str) -> None:
-        """Import conversation from a JSON file."""
+        """Import conversation from a JSON file.
+        
+        The current history is replaced only once the whole file has parsed; on any error it is
+        left untouched.
+        """
         try:
-            with open(filename, 'r') as f:
-                data = json.load(f)
-            
-            async with self._lock:
-                self.messages.clear()
-                for msg_data in data.get("messages", []):
-                    message = ChatMessage(
-                        timestamp=datetime.fromisoformat(msg_data["timestamp"]),
+            with open(filename, 'rb') as f:
+                if ijson is not None:
+                    # Messages are parsed one at a time; only the last max_messages are kept
+                    messages = ijson.items(f, 'messages.item', use_float=True)
+                else:
+                    messages = json.load(f).get("messages", [])
+                
+                imported: Deque[ChatMessage] = deque(
+                    (ChatMessage(
+                        timestamp=datetime.fromisoformat(msg_data["timestamp"]).timestamp(),
                         sender=msg_data["sender"],
                         message=msg_data["message"],
                         context=msg_data.get("context")
-                    )
-                    self.messages.append(message)
-                    
+                    ) for msg_data in messages),
+                    maxlen=self.max_messages
+                )
         except Exception as e:
             print(f"Error importing conversation: {e}")
+            return
+        
+        async with self._lock:
+            self.messages.clear()
+            self._reset_stats()
+            self._reset_index()
+            for message in imported:
+                self._append(message)
     
     async def search_messages(self, query: str) -> List[ChatMessage]:
         """Search for messages containing the query."""
-        async with self._lock:
-            matching_messages = []
-            query_lower = query.lower()
-            
-            for msg in self.messages:
-                if query_lower in msg.message.lower():
-                    matching_messages.append(msg)
-            
-            return matching_messages
+        query_lower = query.lower()
+        candidate_ids = self._candidate_ids(query_lower)
+        if candidate_ids is None:
+            candidates = self.messages
+        else:
+            candidates = [self._by_id[msg_id] for msg_id in sorted(candidate_ids)]
+        
+        return [msg for msg in candidates if query_lower in msg.message.lower()]
+    
+    def _candidate_ids(self, query_lower: str) -> Optional[Set[int]]:
+        """Ids of the messages that can contain the query, or None if it has no word tokens.
+        
+        Interior tokens must be whole words of a match. A token touching the start of the query
+        may be the tail of a longer word, and one touching the end its head, so those match
+        indexed words by suffix or prefix (a single-token query by substring).
+        """
+        postings = []
+        for m in re.finditer(r"\w+", query_lower):
+            token = m.group()
+            at_start = m.start() == 0
+            at_end = m.end() == len(query_lower)
+            if at_start and at_end:
+                postings.append(self._postings_where(lambda word: token in word))
+            elif at_start:
+                postings.append(self._postings_where(lambda word: word.endswith(token)))
+            elif at_end:
+                postings.append(self._postings_where(lambda word: word.startswith(token)))
+            else:
+                postings.append(self._index.get(token, set()))
+        
+        if not postings:
+            return None
+        postings.sort(key=len)
+        return set.intersection(*postings)
+    
+    def _postings_where(self, matches: Callable[[str], bool]) -> Set[int]:
+        """Ids of the messages containing any indexed word that satisfies matches."""
+        ids: Set[int] = set()
+        for word, msg_ids in self._index.items():
+            if matches(word):
+                ids |= msg_ids
+        return ids
     
     async def get_message_stats(self) -> Dict[str, Any]:
         """Get statistics about the conversation."""
-        async with self._lock:
-            if not self.messages:
-                return {"total_messages": 0, "user_messages": 0, "assistant_messages": 0}
-            
-            user_count = sum(1 for msg in self.messages if msg.sender == "user")
-            assistant_count = sum(1 for msg in self.messages if msg.sender == "assistant")
-            
-            return {
-                "total_messages": len(self.messages),
-                "user_messages": user_count,
-                "assistant_messages": assistant_count,
-                "conversation_duration": str(self.messages[-1].timestamp - self.messages[0].timestamp),
-                "average_message_length": sum(len(msg.message) for msg in self.messages) / len(self.messages)
-            }
+        if not self.messages:
+            return {"total_messages": 0, "user_messages": 0, "assistant_messages": 0}
+        
+        return {
+            "total_messages": len(self.messages),
+            "user_messages": self._user_count,
+            "assistant_messages": self._assistant_count,
+            "conversation_duration": str(self._duration()),
+            "average_message_length": self._total_chars / len(self.messages)
+        }
 
 
 class ContextManager:
-    """Manages context information for chat interactions."""
+    """Manages context information for chat interactions.
+    
+    Writes replace the read-only snapshots handed out to readers (copy-on-write), so reads
+    need neither the lock nor a copy.
+    """
     
     def __init__(self):
         self.system_context: Dict[str, Any] = {}
         self.user_preferences: Dict[str, Any] = {}
+        self._system_snapshot: Mapping[str, Any] = MappingProxyType({})
+        self._preferences_snapshot: Mapping[str, Any] = MappingProxyType({})
         self._lock = asyncio.Lock()
     
     async def update_system_context(self, context: Dict[str, Any]) -> None:
         """Update system context information."""
         async with self._lock:
             self.system_context.update(context)
+            self._system_snapshot = MappingProxyType(dict(self.system_context))
     
-    async def get_system_context(self) -> Dict[str, Any]:
-        """Get current system context."""
-        async with self._lock:
-            return self.system_context.copy()
+    async def get_system_context(self) -> Mapping[str, Any]:
+        """Get current system context (read-only)."""
+        return self._system_snapshot
     
     async def set_user_preference(self, key: str, value: Any) -> None:
         """Set a user preference."""
         async with self._lock:
             self.user_preferences[key] = value
+            self._preferences_snapshot = MappingProxyType(dict(self.user_preferences))
     
-    async def get_user_preferences(self) -> Dict[str, Any]:
-        """Get user preferences."""
-        async with self._lock:
-            return self.user_preferences.copy()
+    async def get_user_preferences(self) -> Mapping[str, Any]:
+        """Get user preferences (read-only)."""
+        return self._preferences_snapshot
     
     async def get_full_context(self) -> Dict[str, Any]:
-        """Get full context including system and user preferences."""
-        async with self._lock:
-            return {
-                "system": self.system_context.copy(),
-                "user_preferences": self.user_preferences.copy(),
-                "timestamp": datetime.now().isoformat()
-            }
+        """Get full context including system and user preferences (plain dicts, safe to serialize or modify)."""
+        return {
+            "system": dict(self._system_snapshot),
+            "user_preferences": dict(self._preferences_snapshot),
+            "timestamp": datetime.now().isoformat()
+        }
 
 
 # Global instances
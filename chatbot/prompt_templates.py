@@ -2,10 +2,14 @@
 Prompt templates for LLM interactions in the decarbonization AI system.
 """
 
-from jinja2 import Template
+from typing import Dict, Union
+
+from jinja2 import DictLoader, Environment, Template
+
+from utils.templating import FormatTemplate, bytecode_cache, is_simple_template
 
 # Decision prompt for energy management
-DECISION_PROMPT = Template("""
+_DECISION_PROMPT = """
 You are an expert AI energy assistant for an industrial facility.
 
 Given:
@@ -27,10 +31,10 @@ Return JSON:
   "action": "D",
   "explanation": "Grid cost + CO₂ high, delaying non-critical load saves money and emissions."
 }
-""")
+"""
 
 # Infrastructure advice prompt for long-term planning
-INFRA_ADVICE_PROMPT = Template("""
+_INFRA_ADVICE_PROMPT = """
 You are an expert energy consultant for industrial decarbonization.
 
 Current facility data:
@@ -57,10 +61,10 @@ Return JSON:
   ],
   "summary": "Key recommendations for decarbonization..."
 }
-""")
+"""
 
 # Escalation chat prompt for human intervention
-ESCALATION_CHAT_PROMPT = Template("""
+_ESCALATION_CHAT_PROMPT = """
 You are an AI assistant helping with energy system escalations.
 
 Alert: {{ alert_message }}
@@ -73,10 +77,10 @@ Response should be:
 - Actionable
 - Professional tone
 - Include next steps if needed
-""")
+"""
 
 # General chat prompt for operations manager queries
-GENERAL_CHAT_PROMPT = Template("""
+_GENERAL_CHAT_PROMPT = """
 You are an AI energy management assistant for an industrial facility.
 
 Current system status:
@@ -89,10 +93,10 @@ Current system status:
 User question: {{ user_question }}
 
 Provide a helpful, informative response based on the current system status.
-""")
+"""
 
 # Performance analysis prompt
-PERFORMANCE_ANALYSIS_PROMPT = Template("""
+_PERFORMANCE_ANALYSIS_PROMPT = """
 You are an energy performance analyst.
 
 System performance data:
@@ -110,10 +114,10 @@ Return JSON:
   "recommendations": ["Consider more aggressive load shifting"],
   "trends": "Improving efficiency over time"
 }
-""")
+"""
 
 # Alert classification prompt
-ALERT_CLASSIFICATION_PROMPT = Template("""
+_ALERT_CLASSIFICATION_PROMPT = """
 You are an alert classification system for energy management.
 
 Alert message: {{ alert_message }}
@@ -128,10 +132,10 @@ Return JSON:
   "action_required": true,
   "response_template": "Standard response for this type of alert"
 }
-""")
+"""
 
 # Energy optimization prompt
-ENERGY_OPTIMIZATION_PROMPT = Template("""
+_ENERGY_OPTIMIZATION_PROMPT = """
 You are an energy optimization expert.
 
 Current situation:
@@ -154,7 +158,41 @@ Return JSON:
   "expected_savings": 15.50,
   "co2_reduction": 25.0
 }
-""")
+"""
+
+_TEMPLATE_SOURCES: Dict[str, str] = {
+    "decision": _DECISION_PROMPT,
+    "infrastructure_advice": _INFRA_ADVICE_PROMPT,
+    "escalation_chat": _ESCALATION_CHAT_PROMPT,
+    "general_chat": _GENERAL_CHAT_PROMPT,
+    "performance_analysis": _PERFORMANCE_ANALYSIS_PROMPT,
+    "alert_classification": _ALERT_CLASSIFICATION_PROMPT,
+    "energy_optimization": _ENERGY_OPTIMIZATION_PROMPT
+}
+
+# Shared environment for templates that need more than plain substitutions
+env = Environment(
+    loader=DictLoader(_TEMPLATE_SOURCES),
+    bytecode_cache=bytecode_cache(),
+    auto_reload=False
+)
+
+
+def _compile(name: str) -> Union[FormatTemplate, Template]:
+    """Pre-render a template to a format string, or use Jinja if it needs more than substitution."""
+    source = _TEMPLATE_SOURCES[name]
+    if is_simple_template(source):
+        return FormatTemplate(source)
+    return env.get_template(name)
+
+
+DECISION_PROMPT = _compile("decision")
+INFRA_ADVICE_PROMPT = _compile("infrastructure_advice")
+ESCALATION_CHAT_PROMPT = _compile("escalation_chat")
+GENERAL_CHAT_PROMPT = _compile("general_chat")
+PERFORMANCE_ANALYSIS_PROMPT = _compile("performance_analysis")
+ALERT_CLASSIFICATION_PROMPT = _compile("alert_classification")
+ENERGY_OPTIMIZATION_PROMPT = _compile("energy_optimization")
 
 # All available templates
 TEMPLATES = {
@@ -165,4 +203,4 @@ TEMPLATES = {
     "performance_analysis": PERFORMANCE_ANALYSIS_PROMPT,
     "alert_classification": ALERT_CLASSIFICATION_PROMPT,
     "energy_optimization": ENERGY_OPTIMIZATION_PROMPT
-} 
\ No newline at end of file
+}
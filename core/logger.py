@@ -2,13 +2,124 @@
 Unified logging system for the decarbonization AI system.
 """
 
-import json
+import atexit
+import orjson
 import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
 from datetime import datetime
-from typing import Dict, Any, Optional
+from collections import deque
+from dataclasses import dataclass
+from itertools import islice
+from typing import Deque, Dict, Any, List, Optional, Tuple
 from pathlib import Path
-import asyncio
-import threading
+
+
+@dataclass(slots=True)
+class _Event:
+    """A structured log event, serialized as one JSON line."""
+    timestamp: str
+    event_type: str
+    agent: str
+    data: Dict[str, Any]
+
+
+class _BatchedFileHandler(logging.Handler):
+    """Handler that collects formatted records and appends them to a file in large batches.
+    
+    The file is held open as a raw O_APPEND descriptor, so each batch is a single write.
+    """
+    
+    terminator = "\n"
+    
+    def __init__(self, filename: Path, max_bytes: int = 64 * 1024, max_delay: float = 0.1):
+        super().__init__()
+        self.fd: Optional[int] = os.open(
+            filename, os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_CLOEXEC", 0), 0o644
+        )
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self._buf: List[str] = []
+        self._buf_bytes = 0
+        self._last_flush = time.monotonic()
+    
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            line = self.format(record) + self.terminator
+        except Exception:
+            self.handleError(record)
+            return
+        
+        self._buf.append(line)
+        self._buf_bytes += len(line)
+        if self._buf_bytes >= self.max_bytes or time.monotonic() - self._last_flush >= self.max_delay:
+            self.flush()
+    
+    def flush(self) -> None:
+        """Write out all buffered records in one call."""
+        self.acquire()
+        try:
+            if self._buf and self.fd is not None:
+                data = memoryview("".join(self._buf).encode("utf-8"))
+                while data:
+                    data = data[os.write(self.fd, data):]
+                self._buf.clear()
+                self._buf_bytes = 0
+            self._last_flush = time.monotonic()
+        finally:
+            self.release()
+    
+    def close(self) -> None:
+        self.flush()
+        self.acquire()
+        try:
+            if self.fd is not None:
+                os.close(self.fd)
+                self.fd = None
+        finally:
+            self.release()
+        super().close()
+
+
+class _BatchingQueueListener(QueueListener):
+    """QueueListener that flushes its handlers whenever the queue has been idle for a moment."""
+    
+    def __init__(self, q: queue.SimpleQueue, *handlers: logging.Handler, idle_flush: float = 0.1):
+        super().__init__(q, *handlers)
+        self.idle_flush = idle_flush
+    
+    # Returned by dequeue when nothing arrived in time (None is the stop sentinel)
+    _IDLE = object()
+    
+    def dequeue(self, block: bool) -> Any:
+        try:
+            return self.queue.get(block, self.idle_flush)
+        except queue.Empty:
+            return self._IDLE
+    
+    def handle(self, record: Any) -> None:
+        if record is self._IDLE or isinstance(record, threading.Event):
+            for handler in self.handlers:
+                handler.flush()
+            if record is not self._IDLE:
+                record.set()
+            return
+        super().handle(record)
+    
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """Write out every record queued so far; returns False if that took longer than timeout."""
+        if self._thread is None:
+            for handler in self.handlers:
+                handler.flush()
+            return True
+        # Queued behind the pending records, so the listener sets it once they are all handled
+        done = threading.Event()
+        self.queue.put_nowait(done)
+        return done.wait(timeout)
 
 
 class DecarbonLogger:
@@ -18,55 +129,65 @@ class DecarbonLogger:
         self.log_file = Path(log_file)
         self.log_file.parent.mkdir(exist_ok=True)
         
-        # Configure logging
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(self.log_file),
-                logging.StreamHandler()
-            ]
-        )
+        # Records are queued from the event loop and written by a background listener thread,
+        # so agents never block on file or console IO
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        # File writes are batched (64KB or 100ms, whichever comes first)
+        self._handlers = [_BatchedFileHandler(self.log_file), logging.StreamHandler()]
+        for handler in self._handlers:
+            handler.setFormatter(formatter)
         
+        self._queue = queue.SimpleQueue()
         self.logger = logging.getLogger("DecarbonAI")
-        self._lock = None
-        self._thread_local = threading.local()
-    
-    def _get_lock(self):
-        """Get or create the asyncio lock for the current thread."""
-        if not hasattr(self._thread_local, 'lock'):
-            try:
-                # Try to get the current event loop
-                loop = asyncio.get_event_loop()
-                self._thread_local.lock = asyncio.Lock()
-            except RuntimeError:
-                # No event loop in this thread, create a new one
-                self._thread_local.lock = None
-        return self._thread_local.lock
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self.logger.addHandler(QueueHandler(self._queue))
+        
+        self._listener = _BatchingQueueListener(self._queue, *self._handlers)
+        self._listener.start()
+        atexit.register(self._shutdown)
+        
+        # Most recent serialized events, so get_recent_logs never touches the file
+        self._recent: Deque[str] = deque(maxlen=1000)
+        
+        # (millisecond, formatted timestamp) of the last event, swapped as one tuple so threads
+        # logging concurrently never see a millisecond paired with another one's string
+        self._ts_cache: Tuple[int, str] = (-1, "")
+    
+    def _shutdown(self) -> None:
+        """Drain the queue and write out any buffered records."""
+        self._listener.stop()
+        for handler in self._handlers:
+            handler.close()
+    
+    def _timestamp(self) -> str:
+        """ISO timestamp at millisecond precision, formatted once per millisecond."""
+        now_ms = time.time_ns() // 1_000_000
+        cached_ms, cached_str = self._ts_cache
+        if now_ms == cached_ms:
+            return cached_str
+        ts_str = datetime.fromtimestamp(now_ms / 1000).isoformat(timespec="milliseconds")
+        self._ts_cache = (now_ms, ts_str)
+        return ts_str
+    
+    def log_event_nowait(self, event_type: str, data: Dict[str, Any], agent: str = "system") -> None:
+        """Log an event from synchronous code or a hot loop, without creating a coroutine."""
+        self._log_event_sync(event_type, data, agent)
     
     async def log_event(self, event_type: str, data: Dict[str, Any], agent: str = "system") -> None:
         """Log an event with structured data."""
-        lock = self._get_lock()
-        if lock:
-            async with lock:
-                self._log_event_sync(event_type, data, agent)
-        else:
-            self._log_event_sync(event_type, data, agent)
+        self._log_event_sync(event_type, data, agent)
     
     def _log_event_sync(self, event_type: str, data: Dict[str, Any], agent: str = "system") -> None:
         """Synchronous version of log_event."""
-        event = {
-            "timestamp": datetime.now().isoformat(),
-            "event_type": event_type,
-            "agent": agent,
-            "data": data
-        }
+        event = _Event(self._timestamp(), event_type, agent, data)
         
-        # Log to file
-        self.logger.info(json.dumps(event))
+        # orjson serializes the dataclass natively; default=str covers arbitrary data values
+        line = orjson.dumps(event, default=str, option=orjson.OPT_SERIALIZE_NUMPY).decode()
         
-        # Also log to console for debugging
-        print(f"[{event['timestamp']}] {agent}: {event_type} - {data}")
+        # Queued for the file and console handlers
+        self.logger.info(line)
+        self._recent.append(line)
     
     async def log_decision(self, decision: Dict[str, Any], agent: str = "decision_agent") -> None:
         """Log an AI decision."""
@@ -82,26 +203,39 @@ class DecarbonLogger:
     
     async def log_error(self, error: str, agent: str = "system", exception: Optional[Exception] = None) -> None:
         """Log an error."""
+        self.log_error_nowait(error, agent, exception)
+    
+    def log_error_nowait(self, error: str, agent: str = "system", exception: Optional[Exception] = None) -> None:
+        """Log an error without creating a coroutine, e.g. on a request's critical path."""
         error_data = {
             "error": error,
             "exception": str(exception) if exception else None
         }
-        await self.log_event("error", error_data, agent)
+        self._log_event_sync("error", error_data, agent)
     
     async def log_performance(self, metric: str, value: float, agent: str = "system") -> None:
         """Log performance metrics."""
         await self.log_event("performance", {"metric": metric, "value": value}, agent)
     
     async def log_llm_call(self, prompt: str, response: str, agent: str = "llm") -> None:
-        """Log LLM calls (with prompt and response)."""
-        # Truncate long prompts/responses for logging
-        truncated_prompt = prompt[:500] + "..." if len(prompt) > 500 else prompt
-        truncated_response = response[:500] + "..." if len(response) > 500 else response
+        """Log LLM calls (with prompt and response).
         
-        await self.log_event("llm_call", {
-            "prompt": truncated_prompt,
-            "response": truncated_response
-        }, agent)
+        Set LOG_LLM_CONTENT=0 to log only the prompt and response lengths.
+        """
+        self.log_llm_call_nowait(prompt, response, agent)
+    
+    def log_llm_call_nowait(self, prompt: str, response: str, agent: str = "llm") -> None:
+        """Log an LLM call without creating a coroutine, e.g. on a request's critical path."""
+        if os.getenv("LOG_LLM_CONTENT", "1") == "0":
+            data = {"prompt_chars": len(prompt), "response_chars": len(response)}
+        else:
+            # Truncate long prompts/responses for logging; short ones are logged as-is
+            data = {
+                "prompt": f"{prompt[:500]}..." if len(prompt) > 500 else prompt,
+                "response": f"{response[:500]}..." if len(response) > 500 else response
+            }
+        
+        self._log_event_sync("llm_call", data, agent)
     
     async def log_financial(self, cost: float, savings: float, co2_kg: float, agent: str = "system") -> None:
         """Log financial and environmental metrics."""
@@ -112,18 +246,16 @@ class DecarbonLogger:
         }, agent)
     
     def get_recent_logs(self, lines: int = 100) -> list:
-        """Get recent log entries."""
-        try:
-            with open(self.log_file, 'r') as f:
-                return f.readlines()[-lines:]
-        except FileNotFoundError:
-            return []
+        """Get recent log entries (serialized events, oldest first; at most the last 1000)."""
+        return list(islice(self._recent, max(0, len(self._recent) - lines), None))
     
     def export_logs(self, output_file: str) -> None:
         """Export logs to a file."""
         try:
-            with open(self.log_file, 'r') as src, open(output_file, 'w') as dst:
-                dst.write(src.read())
+            # Drain the queue and write out batched records first, then copy in bounded 128KB chunks
+            self._listener.flush()
+            with open(self.log_file, 'rb') as src, open(output_file, 'wb') as dst:
+                shutil.copyfileobj(src, dst, 1 << 17)
         except FileNotFoundError:
             print(f"Log file {self.log_file} not found")
 
@@ -139,4 +271,12 @@ def get_logger():
     return _logger_instance
 
 # For backward compatibility
-logger = get_logger() 
\ No newline at end of file
+logger = get_logger()
+
+
+def fire_log(event_type: str, data: Dict[str, Any], agent: str = "system") -> None:
+    """Log an event without waiting for it to be written.
+    
+    Use for non-critical per-tick events; errors go through log_error / log_error_nowait.
+    """
+    get_logger().log_event_nowait(event_type, data, agent)
@@ -3,6 +3,7 @@ Agent scheduler for orchestrating all decarbonization AI agents.
 """
 
 import asyncio
+import logging
 from typing import List, Dict, Any
 from datetime import datetime
 import signal
@@ -11,6 +12,9 @@ import sys
 from .state import state_manager
 from .logger import logger
 
+# Console/file messages go through the DecarbonAI logger's queue instead of blocking on stdout
+_log = logging.getLogger("DecarbonAI.scheduler")
+
 
 class AgentScheduler:
     """Schedules and manages all agents in the decarbonization AI system."""
@@ -20,11 +24,14 @@ class AgentScheduler:
         self.tasks: Dict[str, asyncio.Task] = {}
         self.running = False
         self._shutdown_event = asyncio.Event()
+        # Bumped whenever agents or their tasks change, so the monitor can skip idle rescans
+        self._tasks_version = 0
     
     def register_agent(self, name: str, agent_instance: Any) -> None:
         """Register an agent with the scheduler."""
         self.agents[name] = agent_instance
-        print(f"Registered agent: {name}")
+        self._tasks_version += 1
+        _log.info("Registered agent: %s", name)
     
     async def start_agent(self, name: str) -> None:
         """Start a specific agent."""
@@ -35,10 +42,11 @@ class AgentScheduler:
         if hasattr(agent, 'start'):
             task = asyncio.create_task(agent.start())
             self.tasks[name] = task
+            self._tasks_version += 1
             await logger.log_event("agent_started", {"agent": name}, "scheduler")
-            print(f"Started agent: {name}")
+            _log.info("Started agent: %s", name)
         else:
-            print(f"Agent {name} has no start method")
+            _log.warning("Agent %s has no start method", name)
     
     async def stop_agent(self, name: str) -> None:
         """Stop a specific agent."""
@@ -51,8 +59,9 @@ class AgentScheduler:
                 except asyncio.CancelledError:
                     pass
             del self.tasks[name]
+            self._tasks_version += 1
             await logger.log_event("agent_stopped", {"agent": name}, "scheduler")
-            print(f"Stopped agent: {name}")
+            _log.info("Stopped agent: %s", name)
     
     async def start_all_agents(self) -> None:
         """Start all registered agents."""
@@ -65,7 +74,7 @@ class AgentScheduler:
             start_tasks.append(self.start_agent(name))
         
         await asyncio.gather(*start_tasks, return_exceptions=True)
-        print("All agents started")
+        _log.info("All agents started")
     
     async def stop_all_agents(self) -> None:
         """Stop all running agents."""
@@ -81,16 +90,18 @@ class AgentScheduler:
             await asyncio.gather(*stop_tasks, return_exceptions=True)
         
         await logger.log_event("scheduler_stopped", {}, "scheduler")
-        print("All agents stopped")
+        _log.info("All agents stopped")
     
     async def get_agent_status(self) -> Dict[str, Any]:
         """Get status of all agents."""
         status = {}
         for name, task in self.tasks.items():
+            # exception() raises on tasks that are still running or were cancelled
+            exception = task.exception() if task.done() and not task.cancelled() else None
             status[name] = {
                 "running": not task.done(),
                 "cancelled": task.cancelled(),
-                "exception": str(task.exception()) if task.exception() else None
+                "exception": str(exception) if exception else None
             }
         return status
     
@@ -103,41 +114,57 @@ class AgentScheduler:
     
     async def monitor_agents(self) -> None:
         """Monitor agent health and restart failed agents."""
+        # Bind hot names once for the lifetime of the loop
+        tasks = self.tasks
+        log_error = logger.log_error
+        restart_agent = self.restart_agent
+        sleep = asyncio.sleep
+        last_version = -1
+        
         while self.running and not self._shutdown_event.is_set():
             try:
-                for name, task in list(self.tasks.items()):
+                # Nothing to do if no agent was started/stopped and no task has finished
+                if self._tasks_version == last_version and not any(task.done() for task in tasks.values()):
+                    await sleep(30)
+                    continue
+                last_version = self._tasks_version
+                
+                for name, task in list(tasks.items()):
                     if task.done() and not task.cancelled():
                         exception = task.exception()
                         if exception:
-                            await logger.log_error(
-                                f"Agent {name} failed: {exception}",
-                                "scheduler",
-                                exception
-                            )
-                            print(f"Agent {name} failed, restarting...")
-                            await self.restart_agent(name)
+                            await log_error(f"Agent {name} failed: {exception}", "scheduler", exception)
+                            _log.warning("Agent %s failed, restarting...", name)
+                            await restart_agent(name)
                 
-                await asyncio.sleep(30)  # Check every 30 seconds
+                await sleep(30)  # Check every 30 seconds
                 
             except Exception as e:
-                await logger.log_error(f"Error in agent monitoring: {e}", "scheduler", e)
-                await asyncio.sleep(60)  # Wait longer on error
+                await log_error(f"Error in agent monitoring: {e}", "scheduler", e)
+                await sleep(60)  # Wait longer on error
     
     def setup_signal_handlers(self) -> None:
-        """Setup signal handlers for graceful shutdown."""
-        def signal_handler(signum, frame):
-            print(f"\nReceived signal {signum}, shutting down gracefully...")
+        """Setup signal handlers for graceful shutdown (call from within the running event loop)."""
+        loop = asyncio.get_running_loop()
+        
+        def request_shutdown(signum: int) -> None:
+            _log.info("Received signal %s, shutting down gracefully...", signum)
             asyncio.create_task(self.shutdown())
         
-        signal.signal(signal.SIGINT, signal_handler)
-        signal.signal(signal.SIGTERM, signal_handler)
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                # Runs the callback on the loop itself, so it is safe to create tasks there
+                loop.add_signal_handler(signum, request_shutdown, signum)
+            except NotImplementedError:
+                # Windows event loops don't support add_signal_handler; hop onto the loop instead
+                signal.signal(signum, lambda s, frame: loop.call_soon_threadsafe(request_shutdown, s))
     
     async def shutdown(self) -> None:
         """Graceful shutdown of the scheduler and all agents."""
-        print("Shutting down scheduler...")
+        _log.info("Shutting down scheduler...")
         await self.stop_all_agents()
         await logger.log_event("system_shutdown", {}, "scheduler")
-        print("Shutdown complete")
+        _log.info("Shutdown complete")
 
 
 # Global scheduler instance
@@ -2,11 +2,16 @@
 Global system state management for the decarbonization AI system.
 """
 
-from pydantic import BaseModel, Field
-from typing import Dict, List, Optional, Any
+from typing import Deque, Dict, List, Optional, Any
+from collections import deque
 from datetime import datetime
 import asyncio
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+import copy
+
+# History lengths kept in the state (oldest entries are evicted first)
+DECISION_HISTORY_SIZE = 100
+ALERT_HISTORY_SIZE = 50
 
 
 @dataclass
@@ -27,51 +32,57 @@ class Alert:
     source: str
 
 
-class SystemState(BaseModel):
+@dataclass(slots=True)
+class SystemState:
     """Global system state for the decarbonization AI system."""
     
     # Real-time sensor data
-    solar_kwh: float = Field(default=0.0, description="Current solar generation in kWh")
-    load_kwh: float = Field(default=0.0, description="Current load consumption in kWh")
-    battery_soc: float = Field(default=50.0, description="Battery state of charge (0-100%)")
-    grid_price: float = Field(default=0.15, description="Current grid price in EUR/kWh")
-    co2_intensity: float = Field(default=400.0, description="Grid CO2 intensity in g/kWh")
+    solar_kwh: float = 0.0  # Current solar generation in kWh
+    load_kwh: float = 0.0  # Current load consumption in kWh
+    battery_soc: float = 50.0  # Battery state of charge (0-100%)
+    grid_price: float = 0.15  # Current grid price in EUR/kWh
+    co2_intensity: float = 400.0  # Grid CO2 intensity in g/kWh
     
     # Forecasted values
-    solar_forecast_kwh: float = Field(default=0.0, description="Forecasted solar generation (1h)")
-    load_forecast_kwh: float = Field(default=0.0, description="Forecasted load consumption (1h)")
+    solar_forecast_kwh: float = 0.0  # Forecasted solar generation (1h)
+    load_forecast_kwh: float = 0.0  # Forecasted load consumption (1h)
     
     # System status
-    timestamp: datetime = Field(default_factory=datetime.now, description="Current timestamp")
-    system_status: str = Field(default="running", description="System status")
+    timestamp: datetime = field(default_factory=datetime.now)  # Current timestamp
+    system_status: str = "running"  # System status
     
     # Control variables
-    hvac_status: str = Field(default="auto", description="HVAC control status")
-    lighting_status: str = Field(default="auto", description="Lighting control status")
-    machine_status: str = Field(default="auto", description="Machine control status")
+    hvac_status: str = "auto"  # HVAC control status
+    lighting_status: str = "auto"  # Lighting control status
+    machine_status: str = "auto"  # Machine control status
     
     # Financial tracking
-    total_cost_eur: float = Field(default=0.0, description="Total energy cost today")
-    total_co2_kg: float = Field(default=0.0, description="Total CO2 emissions today")
-    energy_savings_eur: float = Field(default=0.0, description="Energy savings from AI decisions")
+    total_cost_eur: float = 0.0  # Total energy cost today
+    total_co2_kg: float = 0.0  # Total CO2 emissions today
+    energy_savings_eur: float = 0.0  # Energy savings from AI decisions
     
     # AI decisions and history
-    current_decision: Optional[Decision] = Field(default=None, description="Current AI decision")
-    decision_history: List[Decision] = Field(default_factory=list, description="History of AI decisions")
+    current_decision: Optional[Decision] = None  # Current AI decision
+    # History of AI decisions
+    decision_history: Deque[Decision] = field(default_factory=lambda: deque(maxlen=DECISION_HISTORY_SIZE))
     
     # Alerts and notifications
-    active_alerts: List[Alert] = Field(default_factory=list, description="Active system alerts")
-    alert_history: List[Alert] = Field(default_factory=list, description="History of all alerts")
+    active_alerts: List[Alert] = field(default_factory=list)  # Active system alerts
+    alert_history: Deque[Alert] = field(default_factory=lambda: deque(maxlen=ALERT_HISTORY_SIZE))  # All alerts
     
     # Infrastructure recommendations
-    infrastructure_advice: Dict[str, Any] = Field(default_factory=dict, description="AI infrastructure recommendations")
+    infrastructure_advice: Dict[str, Any] = field(default_factory=dict)  # AI infrastructure recommendations
     
     # Simulation parameters
-    simulation_speed: float = Field(default=1.0, description="Simulation speed multiplier")
-    auto_control_enabled: bool = Field(default=True, description="Whether AI control is enabled")
-    
-    class Config:
-        arbitrary_types_allowed = True
+    simulation_speed: float = 1.0  # Simulation speed multiplier
+    auto_control_enabled: bool = True  # Whether AI control is enabled
+    
+    def __post_init__(self):
+        # Bound histories passed in as plain lists; appends then evict the oldest entries
+        if getattr(self.decision_history, "maxlen", None) != DECISION_HISTORY_SIZE:
+            self.decision_history = deque(self.decision_history, maxlen=DECISION_HISTORY_SIZE)
+        if getattr(self.alert_history, "maxlen", None) != ALERT_HISTORY_SIZE:
+            self.alert_history = deque(self.alert_history, maxlen=ALERT_HISTORY_SIZE)
 
 
 class StateManager:
@@ -81,11 +92,30 @@ class StateManager:
         self._state = SystemState()
         self._lock = asyncio.Lock()
         self._subscribers: List[callable] = []
+        
+        # Copy of the state shared by get_state callers until the next write
+        self._snapshot: Optional[SystemState] = None
     
     async def get_state(self) -> SystemState:
-        """Get a copy of the current state."""
+        """Get a copy of the current state (shared until the next write; treat as read-only)."""
+        if self._snapshot is not None:
+            return self._snapshot
         async with self._lock:
-            return self._state.model_copy()
+            return self._copy_state()
+    
+    def _copy_state(self) -> SystemState:
+        """Return the cached copy of the state, taking a new one if it was invalidated (call under the lock)."""
+        if self._snapshot is None:
+            self._snapshot = copy.copy(self._state)
+        return self._snapshot
+    
+    async def get_snapshot(self) -> SystemState:
+        """Get the current state for read-only agents (treat as read-only).
+        
+        This is the same cached copy get_state returns: every reader between two writes shares
+        it, and the next write invalidates it, so readers never see state older than the last update.
+        """
+        return await self.get_state()
     
     async def update_state(self, **kwargs) -> None:
         """Update the state with new values."""
@@ -96,29 +126,32 @@ class StateManager:
             
             # Update timestamp
             self._state.timestamp = datetime.now()
+            self._snapshot = None
             
-            # Notify subscribers
-            await self._notify_subscribers()
+            callbacks = list(self._subscribers)
+            snapshot = self._copy_state() if callbacks else None
+        
+        # Notify subscribers concurrently, outside the lock so a slow one can't hold up updates
+        if callbacks:
+            results = await asyncio.gather(*(callback(snapshot) for callback in callbacks),
+                                           return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    print(f"Error notifying subscriber: {result}")
     
     async def add_decision(self, decision: Decision) -> None:
         """Add a new AI decision to the state."""
         async with self._lock:
             self._state.current_decision = decision
             self._state.decision_history.append(decision)
-            
-            # Keep only last 100 decisions
-            if len(self._state.decision_history) > 100:
-                self._state.decision_history = self._state.decision_history[-100:]
+            self._snapshot = None
     
     async def add_alert(self, alert: Alert) -> None:
         """Add a new alert to the state."""
         async with self._lock:
             self._state.active_alerts.append(alert)
             self._state.alert_history.append(alert)
-            
-            # Keep only last 50 alerts
-            if len(self._state.alert_history) > 50:
-                self._state.alert_history = self._state.alert_history[-50:]
+            self._snapshot = None
     
     async def clear_resolved_alerts(self) -> None:
         """Clear resolved alerts (implement based on your logic)."""
@@ -129,14 +162,6 @@ class StateManager:
     async def subscribe(self, callback: callable) -> None:
         """Subscribe to state changes."""
         self._subscribers.append(callback)
-    
-    async def _notify_subscribers(self) -> None:
-        """Notify all subscribers of state changes."""
-        for callback in self._subscribers:
-            try:
-                await callback(self._state.model_copy())
-            except Exception as e:
-                print(f"Error notifying subscriber: {e}")
 
 
 # Global state manager instance
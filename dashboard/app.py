@@ -3,19 +3,21 @@ Streamlit dashboard for the decarbonization AI system.
 """
 
 import streamlit as st
-import plotly.graph_objects as go
-import plotly.express as px
-from plotly.subplots import make_subplots
-import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-import time
-import random
+from functools import lru_cache
+import math
+import asyncio
 import os
 import sys
+from typing import Iterator
 
-# Add project root to path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Add project root to path for imports (once; Streamlit re-executes this module on every rerun)
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.append(_PROJECT_ROOT)
+
+from utils.data_utils import now_bucket_sec
+from utils.llm_cache import LLMCache
 
 # Try to import core modules, but don't fail if they're not available
 CORE_AVAILABLE = False
@@ -23,7 +25,7 @@ try:
     # Import with error handling
     from core.state import state_manager
     from core.logger import logger
-    from utils.gemini import llm_orchestrator
+    from utils.gemini import llm_orchestrator, _load_env
     CORE_AVAILABLE = True
 except Exception as e:
     CORE_AVAILABLE = False
@@ -31,40 +33,82 @@ except Exception as e:
     IMPORT_ERROR = str(e)
 
 
-def get_real_ai_response(user_message: str) -> str:
-    """Get real AI response using Gemini."""
+_DEMO_RESPONSE = "This is a demo version. Add your Gemini API key to enable full AI functionality!"
+
+# Full replies to recent prompts, so repeating a question skips the LLM round-trip
+_recent_responses = LLMCache(maxsize=64, ttl=60)
+
+
+def get_real_ai_response(user_message: str) -> Iterator[str]:
+    """Stream a real AI response from Gemini, chunk by chunk (for st.write_stream)."""
     try:
         if not CORE_AVAILABLE:
-            return "This is a demo version. Add your Gemini API key to enable full AI functionality!"
+            yield _DEMO_RESPONSE
+            return
         
-        # Check if API key is set
+        # Check if API key is set (the SDK itself only reads .env on first client construction)
+        _load_env()
         api_key = os.getenv('GEMINI_API_KEY')
         if not api_key or api_key == 'your_gemini_api_key_here':
-            return "This is a demo version. Add your Gemini API key to enable full AI functionality!"
+            yield _DEMO_RESPONSE
+            return
+        
+        cached = _recent_responses.get(user_message)
+        if cached:
+            yield cached
+            return
         
-        # Get AI response
-        response = llm_orchestrator.chat_response(user_message)
+        # Drive the async stream on a private loop, handing chunks to Streamlit as they arrive
+        chunks = []
+        loop = asyncio.new_event_loop()
+        stream = llm_orchestrator.chat_response_stream(user_message)
+        try:
+            while True:
+                try:
+                    chunk = loop.run_until_complete(stream.__anext__())
+                except StopAsyncIteration:
+                    break
+                chunks.append(chunk)
+                yield chunk
+        finally:
+            loop.run_until_complete(stream.aclose())
+            loop.close()
         
-        if response and response.strip():
-            return response
+        response = "".join(chunks)
+        if response.strip():
+            _recent_responses.set(user_message, response)
         else:
-            return "This is a demo version. Add your Gemini API key to enable full AI functionality!"
+            yield _DEMO_RESPONSE
             
     except Exception as e:
-        return f"AI Error: {str(e)}. This is a demo version."
+        yield f"AI Error: {str(e)}. This is a demo version."
+
+
+# Noise bounds for load, battery SOC, grid price and CO2 intensity in the mock state
+_NOISE_LOW = np.array([-10, -5, -0.02, -20])
+_NOISE_HIGH = -_NOISE_LOW
+_rng = np.random.default_rng()
 
 
 def get_mock_state():
     """Generate mock system state for demonstration."""
-    current_time = datetime.now()
-    
-    # Simulate realistic energy data
-    hour = current_time.hour
-    solar_kwh = max(0, 25 * np.sin(np.pi * (hour - 6) / 12)) if 6 <= hour <= 18 else 0
-    load_kwh = 50 + 30 * np.sin(np.pi * hour / 12) + random.uniform(-10, 10)
-    battery_soc = 60 + random.uniform(-5, 5)
-    grid_price = 0.15 + 0.05 * np.sin(np.pi * hour / 12) + random.uniform(-0.02, 0.02)
-    co2_intensity = 400 + 50 * np.sin(np.pi * hour / 12) + random.uniform(-20, 20)
+    current_time = now_bucket_sec()
+    state = _mock_state_for_hour(current_time.hour)
+    state['timestamp'] = current_time
+    return state
+
+
+@st.cache_data(ttl=1, show_spinner=False)
+def _mock_state_for_hour(hour: int):
+    """Build the mock system state (cached briefly; the timestamp is added by the caller)."""
+    # Simulate realistic energy data: scalar sines via math, all noise in one draw
+    daily = math.sin(math.pi * hour / 12)
+    load_noise, soc_noise, price_noise, co2_noise = _rng.uniform(_NOISE_LOW, _NOISE_HIGH).tolist()
+    solar_kwh = max(0, 25 * math.sin(math.pi * (hour - 6) / 12)) if 6 <= hour <= 18 else 0
+    load_kwh = 50 + 30 * daily + load_noise
+    battery_soc = 60 + soc_noise
+    grid_price = 0.15 + 0.05 * daily + price_noise
+    co2_intensity = 400 + 50 * daily + co2_noise
     
     return {
         'solar_kwh': max(0, solar_kwh),
@@ -74,7 +118,6 @@ def get_mock_state():
         'co2_intensity': max(200, co2_intensity),
         'total_cost_eur': load_kwh * grid_price,
         'system_status': 'operational',
-        'timestamp': current_time,
         'current_decision': {
             'action': 'Charge battery from solar',
             'explanation': 'Solar generation exceeds load, storing excess energy',
@@ -138,38 +181,16 @@ def main():
         st.subheader("Agent Status")
         agent_placeholder = st.empty()
     
-    # Main content
-    col1, col2 = st.columns([2, 1])
-    
-    with col1:
-        # Real-time energy flow
-        st.subheader("⚡ Real-time Energy Flow")
-        energy_placeholder = st.empty()
-        
-        # Energy trends
-        st.subheader("📈 Energy Trends")
-        trends_placeholder = st.empty()
-    
-    with col2:
-        # Current metrics
-        st.subheader("📊 Current Metrics")
-        metrics_placeholder = st.empty()
-        
-        # AI Decisions
-        st.subheader("🤖 AI Decisions")
-        decisions_placeholder = st.empty()
-        
-        # Alerts
-        st.subheader("🚨 Alerts")
-        alerts_placeholder = st.empty()
+    # Main content: charts, metrics, decisions and alerts rerun on their own
+    _live_status_fragment()
     
     # Infrastructure recommendations
     st.subheader("🏗️ Infrastructure Recommendations")
     infra_placeholder = st.empty()
     
-    # Chat interface
+    # Chat interface: sending a message only reruns the chat fragment
     st.subheader("💬 AI Assistant")
-    chat_placeholder = st.empty()
+    _chat_fragment()
     
     # Auto-refresh
     if st.button("🔄 Refresh Data"):
@@ -183,36 +204,60 @@ def main():
         st.metric("System Status", state['system_status'])
         st.metric("Last Update", state['timestamp'].strftime("%H:%M:%S"))
     
-    # Update energy flow
-    with energy_placeholder.container():
-        fig = create_energy_flow_chart(state)
-        st.plotly_chart(fig, use_container_width=True)
+    # Update infrastructure recommendations
+    with infra_placeholder.container():
+        if state['infrastructure_advice']:
+            advice = state['infrastructure_advice']
+            if "recommendations" in advice:
+                for rec in advice["recommendations"][:3]:  # Show top 3
+                    with st.expander(f"💡 {rec.get('upgrade', 'Upgrade')}"):
+                        st.write(f"**Cost**: €{rec.get('cost_eur', 0):,}")
+                        st.write(f"**Annual Savings**: €{rec.get('annual_savings_eur', 0):,}")
+                        st.write(f"**ROI**: {rec.get('roi_years', 0):.1f} years")
+                        st.write(f"**CO₂ Reduction**: {rec.get('co2_reduction_kg', 0):,} kg/year")
+        else:
+            st.info("No infrastructure recommendations available")
+
+
+@st.fragment(run_every="5s")
+def _live_status_fragment():
+    """Energy flow, trends, metrics, decisions and alerts, refreshed every 5 seconds."""
+    state = get_mock_state()
+    col1, col2 = st.columns([2, 1])
     
-    # Update trends
-    with trends_placeholder.container():
-        fig = create_trends_chart(state)
+    with col1:
+        # Real-time energy flow
+        st.subheader("⚡ Real-time Energy Flow")
+        fig = create_energy_flow_chart(round(state['solar_kwh'], 2), round(state['load_kwh'], 2),
+                                       round(state['battery_soc'], 2))
+        st.plotly_chart(fig, use_container_width=True)
+        
+        # Energy trends
+        st.subheader("📈 Energy Trends")
+        fig = create_trends_chart(round(state['solar_kwh'], 2), round(state['load_kwh'], 2))
         st.plotly_chart(fig, use_container_width=True)
     
-    # Update metrics
-    with metrics_placeholder.container():
+    with col2:
+        # Current metrics
+        st.subheader("📊 Current Metrics")
         st.metric("Solar Generation", f"{state['solar_kwh']:.1f} kWh")
         st.metric("Load Consumption", f"{state['load_kwh']:.1f} kWh")
         st.metric("Battery SOC", f"{state['battery_soc']:.1f}%")
         st.metric("Grid Price", f"€{state['grid_price']:.3f}/kWh")
         st.metric("CO₂ Intensity", f"{state['co2_intensity']:.0f} g/kWh")
         st.metric("Daily Cost", f"€{state['total_cost_eur']:.2f}")
-    
-    # Update decisions
-    with decisions_placeholder.container():
+        
+        # AI Decisions
+        st.subheader("🤖 AI Decisions")
         if state['current_decision']:
             decision = state['current_decision']
             st.info(f"**Action {decision['action']}**: {decision['explanation']}")
             st.caption(f"Confidence: {decision['confidence']:.1%}")
         else:
             st.info("No recent AI decisions")
-    
-    # Update alerts
-    with alerts_placeholder.container():
+        
+        # Alerts
+        st.subheader("🚨 Alerts")
         for alert in state['active_alerts']:
             if alert['level'] == "critical":
                 st.error(f"🚨 {alert['message']}")
@@ -220,32 +265,29 @@ def main():
                 st.warning(f"⚠️ {alert['message']}")
             elif alert['level'] == "info":
                 st.info(f"ℹ️ {alert['message']}")
-    
-    # Update infrastructure recommendations
-    with infra_placeholder.container():
-        if state['infrastructure_advice']:
-            advice = state['infrastructure_advice']
-            if "recommendations" in advice:
-                for rec in advice["recommendations"][:3]:  # Show top 3
-                    with st.expander(f"💡 {rec.get('upgrade', 'Upgrade')}"):
-                        st.write(f"**Cost**: €{rec.get('cost_eur', 0):,}")
-                        st.write(f"**Annual Savings**: €{rec.get('annual_savings_eur', 0):,}")
-                        st.write(f"**ROI**: {rec.get('roi_years', 0):.1f} years")
-                        st.write(f"**CO₂ Reduction**: {rec.get('co2_reduction_kg', 0):,} kg/year")
-        else:
-            st.info("No infrastructure recommendations available")
-    
-    # Chat interface
-    with chat_placeholder.container():
-        user_input = st.text_input("Ask the AI assistant:", key="chat_input")
-        if st.button("Send", key="send_button"):
-            if user_input:
-                response = get_real_ai_response(user_input)
-                st.success(f"AI response: {response}")
 
 
-def create_energy_flow_chart(state):
-    """Create energy flow sankey diagram."""
+@st.fragment
+def _chat_fragment():
+    """Chat input and the latest AI response."""
+    user_input = st.text_input("Ask the AI assistant:", key="chat_input")
+    if st.button("Send", key="send_button"):
+        if user_input:
+            st.write_stream(get_real_ai_response(user_input))
+
+
+@lru_cache(maxsize=1)
+def _plotly():
+    """Import plotly on first chart render rather than at startup; returns (go, make_subplots)."""
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+    return go, make_subplots
+
+
+@st.cache_data(ttl=5, show_spinner=False)
+def create_energy_flow_chart(solar_kwh: float, load_kwh: float, battery_soc: float):
+    """Create energy flow sankey diagram as a plotly JSON dict (cached per input values)."""
+    go, _ = _plotly()
     fig = go.Figure(data=[go.Sankey(
         node=dict(
             pad=15,
@@ -257,8 +299,8 @@ def create_energy_flow_chart(state):
         link=dict(
             source=[0, 1, 2, 0, 1, 2],  # indices correspond to labels
             target=[2, 3, 3, 3, 3, 4],
-            value=[state['solar_kwh'] * 0.3, state['load_kwh'] * 0.4, state['load_kwh'] * 0.3,
-                   state['solar_kwh'] * 0.7, state['load_kwh'] * 0.6, state['battery_soc'] * 0.1]
+            value=[solar_kwh * 0.3, load_kwh * 0.4, load_kwh * 0.3,
+                   solar_kwh * 0.7, load_kwh * 0.6, battery_soc * 0.1]
         )
     )])
     
@@ -267,15 +309,24 @@ def create_energy_flow_chart(state):
         font_size=10,
         height=400
     )
-    return fig
+    # A plain dict is far cheaper than a Figure for the cache to copy on every hit
+    return fig.to_plotly_json()
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _trend_series(solar_kwh: float, load_kwh: float):
+    """Simulate 24 hours of solar and load history around the current values."""
+    hours = np.arange(24)
+    solar_data = solar_kwh * (0.5 + 0.5 * (hours % 12) / 12)
+    load_data = load_kwh * (0.8 + 0.4 * (hours % 8) / 8)
+    return hours, solar_data, load_data
 
 
-def create_trends_chart(state):
-    """Create energy trends chart."""
-    # Simulate historical data
-    hours = list(range(24))
-    solar_data = [state['solar_kwh'] * (0.5 + 0.5 * (i % 12) / 12) for i in hours]
-    load_data = [state['load_kwh'] * (0.8 + 0.4 * (i % 8) / 8) for i in hours]
+@st.cache_data(ttl=5, show_spinner=False)
+def create_trends_chart(solar_kwh: float, load_kwh: float):
+    """Create energy trends chart as a plotly JSON dict (cached per input values)."""
+    go, make_subplots = _plotly()
+    hours, solar_data, load_data = _trend_series(solar_kwh, load_kwh)
     
     fig = make_subplots(
         rows=2, cols=1,
@@ -303,7 +354,7 @@ def create_trends_chart(state):
     fig.update_yaxes(title_text="kWh", row=1, col=1)
     fig.update_yaxes(title_text="kWh", row=2, col=1)
     
-    return fig
+    return fig.to_plotly_json()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,70 @@
+"""
+Tests for the CSV data loader and the anomaly detector.
+"""
+
+import csv
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from utils.data_utils import DataLoader, DataProcessor, _z_score_mask
+
+
+class RecentRowsTest(unittest.TestCase):
+    """get_latest_data and append_row stay consistent with the file on disk."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.loader = DataLoader(tmp.name)
+
+    def test_latest_data_matches_tail(self):
+        df = self.loader.load_csv("solar.csv")
+        pd.testing.assert_frame_equal(self.loader.get_latest_data("solar.csv", 5), df.tail(5))
+
+    def test_append_keeps_file_header(self):
+        # No timestamp column on disk; load_csv adds one in memory only
+        pd.DataFrame({"value": [1.0, 2.0, 3.0]}).to_csv(self.loader.data_dir / "meter.csv", index=False)
+        self.assertIn("timestamp", self.loader.load_csv("meter.csv").columns)
+
+        self.loader.append_row("meter.csv", {"value": 4.0, "timestamp": "2024-01-01 00:00:00"})
+
+        with open(self.loader.data_dir / "meter.csv", newline="") as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], ["value"])
+        self.assertEqual(rows[-1], ["4.0"])
+
+        latest = self.loader.get_latest_data("meter.csv", 2)
+        self.assertEqual(list(latest.index), [2, 3])
+        self.assertEqual(list(latest["value"]), [3.0, 4.0])
+        self.assertEqual(latest["value"].dtype, "float64")
+
+
+class AnomalyTest(unittest.TestCase):
+    """The z-score kernel flags the same values as NumPy's mean and std."""
+
+    def _expected(self, x: np.ndarray, threshold: float) -> np.ndarray:
+        return np.abs(x - x.mean()) > threshold * x.std()
+
+    def test_matches_numpy(self):
+        x = np.random.default_rng(0).standard_normal(1000)
+        x[::97] += 6
+        np.testing.assert_array_equal(_z_score_mask(x, 2.0), self._expected(x, 2.0))
+        np.testing.assert_array_equal(DataProcessor.detect_anomalies(x, 2.0), self._expected(x, 2.0))
+
+    def test_large_offset(self):
+        # E[x^2] - mean^2 loses every significant digit of the variance here
+        x = 1e9 + np.random.default_rng(1).standard_normal(1000)
+        x[500] += 10
+        mask = _z_score_mask(x, 3.0)
+        np.testing.assert_array_equal(mask, self._expected(x, 3.0))
+        self.assertTrue(mask[500])
+
+    def test_constant(self):
+        self.assertFalse(_z_score_mask(np.full(10, 5.0), 2.0).any())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+"""
+Tests for per-key Gemini clients, with the generativelanguage service client mocked out.
+"""
+
+import asyncio
+import threading
+import time
+import unittest
+from unittest import mock
+
+import google.ai.generativelanguage as glm
+
+from utils import gemini
+
+
+def _reply(text: str) -> glm.GenerateContentResponse:
+    """A service response carrying one candidate with the given text."""
+    return glm.GenerateContentResponse(candidates=[glm.Candidate(
+        content=glm.Content(role="model", parts=[glm.Part(text=text)]),
+        finish_reason=glm.Candidate.FinishReason.STOP
+    )])
+
+
+class KeyedClientTest(unittest.TestCase):
+    """GeminiClient(api_key=...) talks to its own service client for that key."""
+
+    def setUp(self):
+        patcher = mock.patch.object(gemini.glm, "GenerativeServiceClient")
+        self.service_cls = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.service = self.service_cls.return_value
+
+    def test_pool_builds_one_service_client_per_key(self):
+        with mock.patch.dict("os.environ", {"GEMINI_API_KEYS": "key-a, key-b"}):
+            pool = gemini.GeminiPool.from_env()
+
+        self.assertEqual(len(pool.clients), 2)
+        keys = [call.kwargs["client_options"]["api_key"] for call in self.service_cls.call_args_list]
+        self.assertEqual(keys, ["key-a", "key-b"])
+
+    def test_generate_json_response(self):
+        self.service.generate_content.return_value = _reply('{"action": "D", "explanation": "x"}')
+        client = gemini.GeminiClient("gemini-1.5-flash", api_key="key-a")
+
+        result = asyncio.run(client.generate_json_response("prompt", schema=gemini.DECISION_SCHEMA))
+
+        self.assertEqual(result, {"action": "D", "explanation": "x"})
+        request = self.service.generate_content.call_args.args[0]
+        self.assertEqual(request.model, "models/gemini-1.5-flash")
+        self.assertEqual(request.contents[0].parts[0].text, "prompt")
+        self.assertEqual(request.generation_config.response_mime_type, "application/json")
+
+    def test_chat_resends_history(self):
+        self.service.generate_content.side_effect = [_reply("first"), _reply("second")]
+        client = gemini.GeminiClient("gemini-1.5-flash", api_key="key-a")
+
+        async def chat():
+            return [await client.chat_response("hello"), await client.chat_response("again")]
+
+        self.assertEqual(asyncio.run(chat()), ["first", "second"])
+        request = self.service.generate_content.call_args.args[0]
+        self.assertEqual([(c.role, c.parts[0].text) for c in request.contents],
+                         [("user", "hello"), ("model", "first"), ("user", "again")])
+
+
+class TokenBucketTest(unittest.TestCase):
+    """Loops on several threads sharing one bucket never take more than it refills."""
+
+    def test_shared_across_threads(self):
+        bucket = gemini.TokenBucket(rate=1000, capacity=100)
+
+        async def take():
+            for _ in range(50):
+                await bucket.acquire(1)
+
+        threads = [threading.Thread(target=asyncio.run, args=(take(),)) for _ in range(8)]
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # 400 tokens from a full bucket of 100 need at least 300 / rate seconds of refill
+        self.assertGreaterEqual(time.monotonic() - start, 0.29)
+        self.assertGreaterEqual(bucket._tokens, 0)
+
+
+class AsyncSdkLoopTest(unittest.TestCase):
+    """Only the first event loop to call Gemini uses the SDK's async client."""
+
+    def test_other_loops_run_threaded(self):
+        with mock.patch.object(gemini.glm, "GenerativeServiceClient"):
+            client = gemini.GeminiClient("gemini-1.5-flash", api_key="key-a")
+        client.model = mock.Mock()
+        client.model.generate_content_async = mock.AsyncMock(return_value=mock.Mock(text="async"))
+        client.model.generate_content.return_value = mock.Mock(text="threaded")
+        client._async_sdk = True
+
+        with mock.patch.object(gemini, "_async_sdk_loop", None):
+            first = asyncio.run(client.generate_response("prompt"))
+            second = asyncio.run(client.generate_response("prompt"))
+
+        self.assertEqual((first, second), ("async", "threaded"))
+
+
+if __name__ == "__main__":
+    unittest.main()
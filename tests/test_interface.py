@@ -0,0 +1,93 @@
+"""
+Tests for the chatbot interface helpers that run without Streamlit's script runner.
+"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from chatbot import interface
+
+
+class ApiKeyTest(unittest.TestCase):
+    """The chatbot finds GEMINI_API_KEY in .env before it loads the core modules."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.env_file = os.path.join(tmp.name, ".env")
+        patcher = mock.patch.dict("os.environ")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        os.environ.pop("GEMINI_API_KEY", None)
+
+    def _write_env(self, key: str) -> None:
+        with open(self.env_file, "w") as f:
+            f.write(f"GEMINI_API_KEY={key}\n")
+
+    def test_key_only_in_env_file(self):
+        self._write_env("key-from-dotenv")
+        with mock.patch.object(interface, "_ENV_FILE", self.env_file):
+            self.assertTrue(interface._gemini_key_set())
+        self.assertEqual(os.environ["GEMINI_API_KEY"], "key-from-dotenv")
+
+    def test_placeholder_key_in_env_file(self):
+        self._write_env("your_gemini_api_key_here")
+        with mock.patch.object(interface, "_ENV_FILE", self.env_file):
+            self.assertFalse(interface._gemini_key_set())
+
+
+class RealResponseTest(unittest.TestCase):
+    """get_real_ai_response awaits the orchestrator's chat call with the state in the prompt."""
+
+    def test_chat_response_is_awaited(self):
+        orchestrator = mock.Mock()
+        orchestrator.chat_response = mock.AsyncMock(return_value="Charge the battery.")
+        with mock.patch.object(interface, "_gemini_key_set", return_value=True), \
+                mock.patch.object(interface, "_load_core", return_value=orchestrator):
+            response = interface.get_real_ai_response("Should I charge now?")
+
+        self.assertEqual(response, "Charge the battery.")
+        (prompt,), _ = orchestrator.chat_response.call_args
+        self.assertIn("Current System State:", prompt)
+        self.assertTrue(prompt.endswith("User question: Should I charge now?"))
+
+
+class MockStateTest(unittest.TestCase):
+    """The cached mock state varies by day as well as hour and can't be altered by callers."""
+
+    def test_seeded_by_day_and_hour(self):
+        day_one = interface._mock_system_state_for_hour(739000, 12)
+        day_two = interface._mock_system_state_for_hour(739001, 12)
+        self.assertNotEqual(day_one["load_kwh"], day_two["load_kwh"])
+        self.assertEqual(day_one, interface._mock_system_state_for_hour(739000, 12))
+
+    def test_callers_get_copies(self):
+        state = interface.get_mock_system_state()
+        state["battery_soc"] = -1
+        state["current_decision"]["action"] = "changed"
+
+        fresh = interface.get_mock_system_state()
+        self.assertNotEqual(fresh["battery_soc"], -1)
+        self.assertNotEqual(fresh["current_decision"]["action"], "changed")
+
+
+class MockIntentTest(unittest.TestCase):
+    """Mock replies follow intent priority, not keyword position in the message."""
+
+    def test_priority_over_position(self):
+        cases = {
+            "What about carbon and my savings?": interface._SAVINGS_RESPONSE,
+            "Any upgrade ideas? Show AI DECISIONS first": interface._decisions_response(),
+            "How do I optimize efficiency?": interface._OPTIMIZE_RESPONSE,
+            "CO2 this week": interface._CO2_RESPONSE,
+            "hello": interface._HELP_RESPONSE,
+        }
+        for message, expected in cases.items():
+            with self.subTest(message=message):
+                self.assertEqual(interface.get_mock_ai_response(message), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+"""
+Tests for the queued, batched log writer.
+"""
+
+import atexit
+import os
+import tempfile
+import unittest
+
+from core.logger import DecarbonLogger
+
+
+class ExportLogsTest(unittest.TestCase):
+    """export_logs includes events that are still queued for the listener thread."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.log = DecarbonLogger(os.path.join(self.dir, "system.log"))
+        self.addCleanup(self._close)
+
+    def _close(self):
+        # Every DecarbonLogger attaches to the shared "DecarbonAI" logger; detach this one
+        for handler in list(self.log.logger.handlers):
+            if getattr(handler, "queue", None) is self.log._queue:
+                self.log.logger.removeHandler(handler)
+        atexit.unregister(self.log._shutdown)
+        self.log._shutdown()
+
+    def test_export_right_after_logging(self):
+        for i in range(50):
+            self.log.log_event_nowait("tick", {"i": i})
+        out = os.path.join(self.dir, "export.log")
+        self.log.export_logs(out)
+
+        with open(out) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(len(lines), 50)
+        self.assertIn('"i":49', lines[-1])
+
+
+if __name__ == "__main__":
+    unittest.main()
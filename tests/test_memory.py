@@ -0,0 +1,80 @@
+"""
+Tests for chat memory search and context management.
+"""
+
+import asyncio
+import json
+import unittest
+
+import orjson
+
+from chatbot.memory import ChatMemory, ContextManager
+
+
+class SearchMessagesTest(unittest.TestCase):
+    """search_messages narrows candidates through the token index, edge tokens included."""
+
+    MESSAGES = [
+        "Should I charge the battery now?",
+        "The batteries are full",
+        "Solar output is low today",
+        "Recharge overnight when power is cheap",
+    ]
+
+    def setUp(self):
+        self.memory = ChatMemory()
+
+        async def populate():
+            for text in self.MESSAGES:
+                await self.memory.add_message("user", text)
+
+        asyncio.run(populate())
+
+    def _search(self, query):
+        return [msg.message for msg in asyncio.run(self.memory.search_messages(query))]
+
+    def test_partial_words_at_the_edges(self):
+        self.assertEqual(self._search("charge the batt"), [self.MESSAGES[0]])
+        self.assertEqual(self._search("arge"), [self.MESSAGES[0], self.MESSAGES[3]])
+        self.assertEqual(self._search("ar output is l"), [self.MESSAGES[2]])
+        self.assertEqual(self._search("?"), [self.MESSAGES[0]])
+
+    def test_edge_tokens_narrow_through_the_index(self):
+        self.assertEqual(self.memory._candidate_ids("charge the batt"), {0})
+        self.assertEqual(self.memory._candidate_ids("batter"), {0, 1})
+        self.assertEqual(self.memory._candidate_ids("ar output"), {2})
+        self.assertIsNone(self.memory._candidate_ids("?"))
+
+
+class ContextManagerTest(unittest.TestCase):
+    """get_full_context hands out plain data that callers can serialize and modify."""
+
+    def setUp(self):
+        self.manager = ContextManager()
+
+        async def populate():
+            await self.manager.update_system_context({"solar_kwh": 12.5, "battery_soc": 60})
+            await self.manager.set_user_preference("units", "kWh")
+
+        asyncio.run(populate())
+
+    def test_full_context_serializes(self):
+        context = asyncio.run(self.manager.get_full_context())
+
+        for dumps in (json.dumps, orjson.dumps):
+            decoded = json.loads(dumps(context))
+            self.assertEqual(decoded["system"], {"solar_kwh": 12.5, "battery_soc": 60})
+            self.assertEqual(decoded["user_preferences"], {"units": "kWh"})
+
+    def test_modifying_full_context_leaves_manager_unchanged(self):
+        context = asyncio.run(self.manager.get_full_context())
+        context["system"]["solar_kwh"] = 0.0
+        context["user_preferences"]["units"] = "MWh"
+
+        fresh = asyncio.run(self.manager.get_full_context())
+        self.assertEqual(fresh["system"]["solar_kwh"], 12.5)
+        self.assertEqual(fresh["user_preferences"]["units"], "kWh")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+"""
+Tests for the shared template bytecode cache.
+"""
+
+import unittest
+from unittest import mock
+
+from utils import templating
+
+
+class BytecodeCacheTest(unittest.TestCase):
+    """The cache directory is created on first use, and a failure only disables caching."""
+
+    def setUp(self):
+        templating.bytecode_cache.cache_clear()
+        self.addCleanup(templating.bytecode_cache.cache_clear)
+
+    def test_directory_created_on_first_use(self):
+        with mock.patch.object(templating.os, "makedirs") as makedirs:
+            cache = templating.bytecode_cache("test_%s.cache")
+        makedirs.assert_called_once_with(templating._BYTECODE_CACHE_DIR, exist_ok=True)
+        self.assertEqual(cache.pattern, "test_%s.cache")
+
+    def test_unwritable_directory_disables_cache(self):
+        with mock.patch.object(templating.os, "makedirs", side_effect=PermissionError):
+            self.assertIsNone(templating.bytecode_cache())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,154 +2,377 @@
 Data utilities for loading and processing sensor data.
 """
 
+import csv
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Tuple, Optional
+from collections import OrderedDict, deque
+from itertools import islice
+from typing import Any, Deque, Dict, List, Tuple, Optional
 from pathlib import Path
 import asyncio
-from datetime import datetime, timedelta
+import time
+from datetime import datetime
+from functools import lru_cache
+
+# Use the multithreaded pyarrow CSV parser, and Parquet sidecar caches, when available
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+    CSV_ENGINE = "pyarrow"
+except ImportError:
+    pa = None
+    CSV_ENGINE = "c"
+
+# Compile the hot numeric kernels with Numba when it is installed
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+def _z_score_mask(data: np.ndarray, threshold: float) -> np.ndarray:
+    """Flag values more than threshold standard deviations from the mean.
+    
+    The variance is taken over deviations from the mean (two passes), not as E[x^2] - mean^2,
+    which cancels catastrophically when the mean is large relative to the spread.
+    """
+    n = data.shape[0]
+    s = 0.0
+    for i in range(n):
+        s += data[i]
+    mean = s / n
+    
+    ss = 0.0
+    for i in range(n):
+        d = data[i] - mean
+        ss += d * d
+    out = np.zeros(n, np.bool_)
+    if ss == 0.0:
+        return out
+    
+    limit = threshold * np.sqrt(ss / n)
+    for i in range(n):
+        d = data[i] - mean
+        out[i] = d > limit or d < -limit
+    return out
+
+
+if njit is not None:
+    _z_score_mask = njit(cache=True)(_z_score_mask)
+
+
+def now_bucket_sec() -> datetime:
+    """Current local time truncated to the second, so derived timestamps line up across calls."""
+    return datetime.fromtimestamp(int(time.time()))
+
+
+@lru_cache(maxsize=8)
+def _hourly_index(start: datetime, periods: int) -> pd.DatetimeIndex:
+    """Hourly timestamps from start (indexes are immutable, so callers can share one)."""
+    return pd.date_range(start=start, periods=periods, freq='H')
+
+
+def _today_hourly_index(periods: int) -> pd.DatetimeIndex:
+    """Hourly timestamps starting at today's midnight."""
+    return _hourly_index(now_bucket_sec().replace(hour=0, minute=0, second=0), periods)
 
 
 class DataLoader:
     """Handles loading and processing of sensor data files."""
     
+    # Most recent rows kept in memory per file for get_latest_data (one week of hourly data)
+    RING_SIZE = 7 * 24
+    
+    # Parsed frames kept in memory, least recently used evicted first
+    CACHE_SIZE = 16
+    
     def __init__(self, data_dir: str = "data"):
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(exist_ok=True)
-        self._cache: Dict[str, pd.DataFrame] = {}
+        self._cache: "OrderedDict[Tuple[Path, int, int, Optional[Tuple[str, ...]]], pd.DataFrame]" = OrderedDict()
+        self._rng = np.random.default_rng()
+        self._rings: Dict[str, Deque[Dict[str, Any]]] = {}
+        # Per ring: the frame's dtypes, its row count, and the column header on disk
+        self._dtypes: Dict[str, pd.Series] = {}
+        self._row_counts: Dict[str, int] = {}
+        self._headers: Dict[str, List[str]] = {}
     
-    def load_csv(self, filename: str) -> pd.DataFrame:
-        """Load a CSV file with sensor data."""
-        filepath = self.data_dir / filename
+    def load_csv(self, filename: str, usecols: Optional[List[str]] = None) -> pd.DataFrame:
+        """Load a CSV file with sensor data.
         
-        if filepath in self._cache:
-            return self._cache[filepath]
+        If usecols is given, only those columns (plus the timestamp) are parsed.
+        """
+        filepath = self.data_dir / filename
         
         if not filepath.exists():
             # Create sample data if file doesn't exist
-            df = self._create_sample_data(filename)
-            df.to_csv(filepath, index=False)
+            self._create_sample_data(filename).to_csv(filepath, index=False)
+        
+        # Size and ns mtime in the key, so a rewritten file is never served stale
+        st = filepath.stat()
+        cache_key = (filepath, st.st_mtime_ns, st.st_size, tuple(usecols) if usecols else None)
+        
+        df = self._cache.get(cache_key)
+        if df is not None:
+            self._cache.move_to_end(cache_key)
+            return df
+        
+        if pa is not None:
+            df = self._load_with_arrow(filepath, st.st_mtime, usecols)
         else:
-            df = pd.read_csv(filepath)
+            # Only parse the requested columns that are actually in the file
+            header = pd.read_csv(filepath, nrows=0).columns
+            columns = [col for col in header if not usecols or col in usecols or col == 'timestamp']
+            df = pd.read_csv(filepath, usecols=columns, engine=CSV_ENGINE, memory_map=True,
+                             parse_dates=['timestamp'] if 'timestamp' in columns else False)
         
         # Ensure datetime column exists
         if 'timestamp' not in df.columns:
-            df['timestamp'] = pd.date_range(
-                start=datetime.now().replace(hour=0, minute=0, second=0, microsecond=0),
-                periods=len(df),
-                freq='H'
-            )
-        else:
+            df['timestamp'] = _today_hourly_index(len(df))
+        elif not pd.api.types.is_datetime64_any_dtype(df['timestamp']):
             df['timestamp'] = pd.to_datetime(df['timestamp'])
         
-        self._cache[filepath] = df
+        # Keep rows in time order so lookups can binary-search the timestamps
+        if not df['timestamp'].is_monotonic_increasing:
+            df = df.sort_values('timestamp', ignore_index=True)
+        
+        self._cache[cache_key] = df
+        while len(self._cache) > self.CACHE_SIZE:
+            self._cache.popitem(last=False)
         return df
     
+    def _load_with_arrow(self, filepath: Path, src_mtime: float,
+                         usecols: Optional[List[str]] = None) -> pd.DataFrame:
+        """Load a CSV via a Parquet sidecar, (re)building the sidecar when the CSV is newer."""
+        parquet_path = filepath.with_suffix('.parquet')
+        
+        if parquet_path.exists() and parquet_path.stat().st_mtime >= src_mtime:
+            names = pq.read_schema(parquet_path).names
+            columns = [col for col in names if col in usecols or col == 'timestamp'] if usecols else None
+            table = pq.read_table(parquet_path, columns=columns, memory_map=True)
+        else:
+            table = pa_csv.read_csv(
+                filepath,
+                convert_options=pa_csv.ConvertOptions(column_types={'timestamp': pa.timestamp('ns')})
+            )
+            try:
+                pq.write_table(table, parquet_path, compression='zstd')
+            except OSError as e:
+                print(f"Could not write Parquet cache {parquet_path}: {e}")
+            if usecols:
+                table = table.select([col for col in table.column_names if col in usecols or col == 'timestamp'])
+        
+        return table.to_pandas()
+    
     def _create_sample_data(self, filename: str) -> pd.DataFrame:
-        """Create sample sensor data for testing."""
+        """Create sample sensor data for testing (float32 readings)."""
         hours = 24
-        base_time = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        timestamps = _today_hourly_index(hours)
+        h = np.arange(hours, dtype=np.float32)
+        rng = self._rng
         
         if 'solar' in filename.lower():
-            # Solar generation data (peak at noon)
-            hours_range = np.arange(hours)
-            solar_data = 50 * np.sin(np.pi * (hours_range - 6) / 12) ** 2
-            solar_data = np.maximum(solar_data, 0)  # No negative values
+            # Solar generation data (peak at noon), never negative
+            solar_data = np.sin(np.pi * (h - 6) / 12, dtype=np.float32)
+            np.square(solar_data, out=solar_data)
+            solar_data *= 50
             
             return pd.DataFrame({
-                'timestamp': pd.date_range(base_time, periods=hours, freq='H'),
+                'timestamp': timestamps,
                 'solar_kwh': solar_data,
-                'efficiency': np.random.uniform(0.8, 0.95, hours)
-            })
+                'efficiency': self._uniform(0.8, 0.95, hours)
+            }, copy=False)
         
         elif 'load' in filename.lower():
             # Load consumption data (higher during business hours)
-            hours_range = np.arange(hours)
             base_load = 100  # Base load in kWh
-            business_hours = np.where((hours_range >= 8) & (hours_range <= 18), 1.5, 0.3)
-            load_data = base_load * business_hours + np.random.normal(0, 10, hours)
+            load_data = np.where((h >= 8) & (h <= 18), np.float32(1.5 * base_load), np.float32(0.3 * base_load))
+            load_data += 10 * rng.standard_normal(hours, dtype=np.float32)
+            np.maximum(load_data, 20, out=load_data)  # Minimum load
+            # HVAC, lighting and machine loads drawn in one call
+            hvac, lighting, machines = self._uniform(np.array([[20], [10], [30]], dtype=np.float32),
+                                                     np.array([[40], [25], [80]], dtype=np.float32),
+                                                     (3, hours))
             
             return pd.DataFrame({
-                'timestamp': pd.date_range(base_time, periods=hours, freq='H'),
-                'load_kwh': np.maximum(load_data, 20),  # Minimum load
-                'hvac_kwh': np.random.uniform(20, 40, hours),
-                'lighting_kwh': np.random.uniform(10, 25, hours),
-                'machines_kwh': np.random.uniform(30, 80, hours)
-            })
+                'timestamp': timestamps,
+                'load_kwh': load_data,
+                'hvac_kwh': hvac,
+                'lighting_kwh': lighting,
+                'machines_kwh': machines
+            }, copy=False)
         
         elif 'price' in filename.lower():
             # Grid price data (higher during peak hours)
-            hours_range = np.arange(hours)
             base_price = 0.15  # Base price in EUR/kWh
-            peak_hours = np.where((hours_range >= 17) & (hours_range <= 21), 1.3, 1.0)
-            price_data = base_price * peak_hours + np.random.normal(0, 0.02, hours)
+            price_data = np.where((h >= 17) & (h <= 21), np.float32(1.3 * base_price), np.float32(base_price))
+            price_data += np.float32(0.02) * rng.standard_normal(hours, dtype=np.float32)
+            np.maximum(price_data, 0.05, out=price_data)
             
             return pd.DataFrame({
-                'timestamp': pd.date_range(base_time, periods=hours, freq='H'),
-                'grid_price_eur_kwh': np.maximum(price_data, 0.05),
-                'co2_intensity_g_kwh': np.random.uniform(350, 450, hours)
-            })
+                'timestamp': timestamps,
+                'grid_price_eur_kwh': price_data,
+                'co2_intensity_g_kwh': self._uniform(350, 450, hours)
+            }, copy=False)
         
         else:
             # Generic sensor data
             return pd.DataFrame({
-                'timestamp': pd.date_range(base_time, periods=hours, freq='H'),
-                'value': np.random.uniform(0, 100, hours)
-            })
+                'timestamp': timestamps,
+                'value': self._uniform(0, 100, hours)
+            }, copy=False)
+    
+    def _uniform(self, low, high, size) -> np.ndarray:
+        """Draw float32 uniform samples in [low, high) (Generator.uniform only produces float64)."""
+        values = self._rng.random(size, dtype=np.float32)
+        values *= high - low
+        values += low
+        return values
     
     def get_latest_data(self, filename: str, hours: int = 1) -> pd.DataFrame:
-        """Get the latest N hours of data from a file."""
-        df = self.load_csv(filename)
-        return df.tail(hours)
+        """Get the latest N hours of data from a file (at most RING_SIZE rows, served from memory).
+        
+        The frame matches load_csv(filename).tail(hours): same columns, dtypes and row labels.
+        """
+        ring = self._get_ring(filename)
+        count = max(0, min(hours, len(ring)))
+        dtypes = self._dtypes[filename]
+        start = self._row_counts[filename] - count
+        df = pd.DataFrame(list(islice(ring, len(ring) - count, None)), columns=dtypes.index,
+                          index=pd.RangeIndex(start, start + count))
+        return df.astype(dtypes.to_dict())
+    
+    def append_row(self, filename: str, row: Dict[str, Any]) -> None:
+        """Append one row of readings to a data file and to its in-memory ring of recent rows."""
+        ring = self._get_ring(filename)
+        ring.append(row)
+        self._row_counts[filename] += 1
+        
+        # Append-only write under the file's own header (not the timestamp load_csv may add);
+        # load_csv picks the change up via the mtime
+        with open(self.data_dir / filename, 'a', newline='') as f:
+            csv.DictWriter(f, fieldnames=self._headers[filename], extrasaction='ignore').writerow(row)
+    
+    def _get_ring(self, filename: str) -> Deque[Dict[str, Any]]:
+        """Get the ring of recent rows for a file, seeding it from the file on first use."""
+        ring = self._rings.get(filename)
+        if ring is None:
+            df = self.load_csv(filename)
+            with open(self.data_dir / filename, newline='') as f:
+                self._headers[filename] = next(csv.reader(f), [])
+            self._dtypes[filename] = df.dtypes
+            self._row_counts[filename] = len(df)
+            ring = deque(df.tail(self.RING_SIZE).to_dict('records'), maxlen=self.RING_SIZE)
+            self._rings[filename] = ring
+        return ring
     
     def get_data_at_time(self, filename: str, target_time: datetime) -> Optional[pd.Series]:
         """Get data for a specific timestamp."""
         df = self.load_csv(filename)
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        if df.empty:
+            return None
         
-        # Find closest timestamp
-        time_diff = abs(df['timestamp'] - target_time)
-        closest_idx = time_diff.idxmin()
+        # Binary-search the sorted timestamps (as int64 ns) for the closest one
+        ts = df['timestamp'].to_numpy(dtype='datetime64[ns]').view('i8')
+        target = int(np.datetime64(target_time, 'ns').view('i8'))
+        pos = int(np.searchsorted(ts, target))
+        closest_idx = min((i for i in (pos - 1, pos) if 0 <= i < len(ts)), key=lambda i: abs(int(ts[i]) - target))
         
-        if time_diff[closest_idx] <= timedelta(hours=1):
+        if abs(int(ts[closest_idx]) - target) <= 3600 * 10**9:  # Within one hour
             return df.iloc[closest_idx]
         return None
 
 
 class RollingWindow:
-    """Manages rolling window calculations for time series data."""
+    """Manages rolling window calculations for time series data.
+    
+    Values are kept in a preallocated float32 ring buffer, and running sums are updated on
+    every insert so mean, std and trend are O(1).
+    """
+    
+    # Recompute the running sums from scratch this often to bound float drift
+    RESYNC_INTERVAL = 1000
     
     def __init__(self, window_size: int = 24):
         self.window_size = window_size
-        self.data: List[float] = []
+        self._buf = np.zeros(window_size, dtype=np.float32)
+        self._head = 0  # Next write position (oldest value once full)
+        self._count = 0
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._sum_xy = 0.0  # Sum of index * value, index 0 being the oldest value
+        self._updates = 0
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    @property
+    def data(self) -> np.ndarray:
+        """Window values, oldest first."""
+        return self.get_values()
+    
+    def get_values(self) -> np.ndarray:
+        """Get a copy of the window values, oldest first."""
+        if self._count < self.window_size:
+            return self._buf[:self._count].copy()
+        return np.roll(self._buf, -self._head)
     
     def add_value(self, value: float) -> None:
         """Add a new value to the rolling window."""
-        self.data.append(value)
-        if len(self.data) > self.window_size:
-            self.data.pop(0)
+        if self._count >= self.window_size:
+            evicted = float(self._buf[self._head])
+            self._sum -= evicted
+            self._sum_sq -= evicted * evicted
+            # Remaining values shift down one index
+            self._sum_xy -= self._sum
+            self._count -= 1
+        
+        self._buf[self._head] = value
+        value = float(self._buf[self._head])  # Use the stored float32 value
+        self._head = (self._head + 1) % self.window_size
+        
+        self._sum_xy += self._count * value
+        self._sum += value
+        self._sum_sq += value * value
+        self._count += 1
+        
+        self._updates += 1
+        if self._updates % self.RESYNC_INTERVAL == 0:
+            self._resync()
+    
+    def _resync(self) -> None:
+        """Recompute running sums from the window contents."""
+        values = self.get_values().astype(np.float64)
+        self._sum = float(values.sum())
+        self._sum_sq = float(values @ values)
+        self._sum_xy = float(np.arange(len(values)) @ values)
     
     def get_mean(self) -> float:
         """Get the mean of the current window."""
-        return np.mean(self.data) if self.data else 0.0
+        return self._sum / self._count if self._count else 0.0
     
     def get_std(self) -> float:
         """Get the standard deviation of the current window."""
-        return np.std(self.data) if len(self.data) > 1 else 0.0
+        n = self._count
+        if n < 2:
+            return 0.0
+        mean = self._sum / n
+        return float(np.sqrt(max(self._sum_sq / n - mean * mean, 0.0)))
     
     def get_trend(self) -> float:
-        """Get the trend (slope) of the current window."""
-        if len(self.data) < 2:
+        """Get the trend (least-squares slope) of the current window."""
+        n = self._count
+        if n < 2:
             return 0.0
         
-        x = np.arange(len(self.data))
-        y = np.array(self.data)
-        slope = np.polyfit(x, y, 1)[0]
-        return slope
+        sum_x = n * (n - 1) / 2
+        sum_x_sq = (n - 1) * n * (2 * n - 1) / 6
+        return (n * self._sum_xy - sum_x * self._sum) / (n * sum_x_sq - sum_x * sum_x)
     
     def is_full(self) -> bool:
         """Check if the window is full."""
-        return len(self.data) >= self.window_size
+        return self._count >= self.window_size
 
 
 class DataProcessor:
@@ -161,12 +384,16 @@ class DataProcessor:
         if len(data) == 0:
             return data
         
-        data_min, data_max = np.min(data), np.max(data)
-        if data_max == data_min:
+        data_min = np.min(data)
+        data_range = np.max(data) - data_min
+        if data_range == 0:
             return np.full_like(data, (min_val + max_val) / 2)
         
-        normalized = (data - data_min) / (data_max - data_min)
-        return normalized * (max_val - min_val) + min_val
+        # One output array, scaled and shifted in place
+        out = np.subtract(data, data_min, dtype=np.result_type(data, 1.0))
+        out *= (max_val - min_val) / data_range
+        out += min_val
+        return out
     
     @staticmethod
     def calculate_moving_average(data: np.ndarray, window: int = 5) -> np.ndarray:
@@ -174,10 +401,18 @@ class DataProcessor:
         if len(data) < window:
             return data
         
-        result = np.convolve(data, np.ones(window) / window, mode='valid')
+        # Window sums from one prefix-sum pass (accumulated in float64, output in the input's float type)
+        n = len(data)
+        csum = np.empty(n + 1, dtype=np.float64)
+        csum[0] = 0.0
+        np.cumsum(data, out=csum[1:])
+        
+        result = np.empty(n, dtype=np.result_type(data, 1.0))
+        np.subtract(csum[window:], csum[:-window], out=result[window - 1:])
+        result[window - 1:] /= window
         # Pad the beginning with the first value
-        padding = np.full(window - 1, data[0])
-        return np.concatenate([padding, result])
+        result[:window - 1] = data[0]
+        return result
     
     @staticmethod
     def detect_anomalies(data: np.ndarray, threshold: float = 2.0) -> np.ndarray:
@@ -185,19 +420,42 @@ class DataProcessor:
         if len(data) < 3:
             return np.zeros_like(data, dtype=bool)
         
+        if njit is not None:
+            return _z_score_mask(np.ascontiguousarray(data, dtype=np.float64), threshold)
+        
         mean = np.mean(data)
         std = np.std(data)
         
         if std == 0:
             return np.zeros_like(data, dtype=bool)
         
-        z_scores = np.abs((data - mean) / std)
-        return z_scores > threshold
+        # Compare |data - mean| against threshold * std, reusing one temporary
+        deviation = np.subtract(data, mean, dtype=np.result_type(data, 1.0))
+        np.abs(deviation, out=deviation)
+        return deviation > threshold * std
     
     @staticmethod
     def interpolate_missing(data: pd.Series) -> pd.Series:
-        """Interpolate missing values in time series data."""
-        return data.interpolate(method='linear').fillna(method='bfill').fillna(method='ffill')
+        """Interpolate missing values in time series data.
+        
+        Gaps are filled linearly by position and the edges take the nearest valid value.
+        """
+        values = data.to_numpy(dtype=np.float64)
+        filled = DataProcessor.interpolate_missing_array(values)
+        if filled is values:
+            return data
+        return pd.Series(filled, index=data.index, name=data.name)
+    
+    @staticmethod
+    def interpolate_missing_array(values: np.ndarray) -> np.ndarray:
+        """NumPy version of interpolate_missing; returns values itself if there is nothing to fill."""
+        valid = ~np.isnan(values)
+        if valid.all() or not valid.any():
+            return values
+        
+        positions = np.arange(len(values))
+        # np.interp holds the end values constant outside the valid range
+        return np.interp(positions, positions[valid], values[valid])
 
 
 # Global instances
@@ -3,85 +3,434 @@ Gemini LLM integration for the decarbonization AI system.
 """
 
 import google.generativeai as genai
-import json
+import google.ai.generativelanguage as glm
+from google.generativeai.types.generation_types import to_generation_config_dict
+from google.api_core import exceptions as google_exceptions
+import orjson
 import asyncio
-from typing import Dict, Any, Optional, List
-from jinja2 import Template
+import contextlib
+import re
+import hashlib
+import random
+import threading
+import time
+from typing import Dict, Any, Optional, List, AsyncIterator, Awaitable, Callable, Union
+from jinja2 import DictLoader, Environment, Template
 import os
+from functools import lru_cache
 from dotenv import load_dotenv
 
 from core.logger import logger
+from core.state import SystemState
+from utils.templating import FormatTemplate, bytecode_cache, is_simple_template
 
-# Load environment variables
-load_dotenv()
+# Values shipped in example .env files, treated as "no key"
+_PLACEHOLDER_KEYS = {"your_gemini_api_key_here", "your-api-key-here"}
 
-# Configure Gemini
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    print("Warning: GEMINI_API_KEY not found in environment variables")
-    GEMINI_API_KEY = "your-api-key-here"  # Placeholder for development
 
-genai.configure(api_key=GEMINI_API_KEY)
+@lru_cache(maxsize=1)
+def _load_env() -> None:
+    """Load environment variables from .env, once, on first client construction."""
+    load_dotenv()
+
+
+@lru_cache(maxsize=1)
+def _configure_default_key() -> None:
+    """Configure the Gemini SDK with GEMINI_API_KEY, once; raises RuntimeError if it isn't set."""
+    _load_env()
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key or api_key in _PLACEHOLDER_KEYS:
+        raise RuntimeError("GEMINI_API_KEY is not set; add it to the environment or to .env")
+    genai.configure(api_key=api_key)
+
+
+# Tokens that matter when matching braces: whole string literals (skipped over) and braces
+_JSON_TOKEN_RE = re.compile(r'"(?:[^"\\]|\\.)*"|[{}]')
+
+
+def _parse_json_object(text: str) -> Optional[Dict[str, Any]]:
+    """Parse the JSON object in an LLM response, tolerating prose or code fences around it.
+    
+    Returns None if the text has no balanced {...} object; raises orjson.JSONDecodeError if
+    none of the candidate objects parse.
+    """
+    stripped = text.strip()
+    if stripped.startswith('{'):
+        try:
+            return orjson.loads(stripped)
+        except orjson.JSONDecodeError:
+            pass
+    
+    # One quote-aware pass over the text, trying each balanced top-level object in turn
+    error = None
+    depth = 0
+    start = 0
+    for match in _JSON_TOKEN_RE.finditer(text):
+        token = match.group()
+        if token == '{':
+            if depth == 0:
+                start = match.start()
+            depth += 1
+        elif token == '}' and depth:
+            depth -= 1
+            if depth == 0:
+                try:
+                    return orjson.loads(text[start:match.end()])
+                except orjson.JSONDecodeError as e:
+                    error = e
+    
+    if error is not None:
+        raise error
+    return None
+
+
+def _generation_config(temperature: float, json_mode: bool = False,
+                       response_schema: Optional[Dict[str, Any]] = None) -> Any:
+    """Generation settings shared by every one-shot prompt.
+    
+    json_mode has Gemini return a bare JSON body (constrained to response_schema if given),
+    so callers can parse it directly instead of scanning prose for an object.
+    """
+    options: Dict[str, Any] = {}
+    if json_mode:
+        options["response_mime_type"] = "application/json"
+        if response_schema is not None:
+            options["response_schema"] = response_schema
+    return genai.types.GenerationConfig(
+        temperature=temperature,
+        max_output_tokens=2048,
+        **options
+    )
+
+
+async def _iter_stream_text(response: Any) -> AsyncIterator[str]:
+    """Yield the text of each chunk of a streaming Gemini response as it arrives."""
+    if hasattr(response, "__aiter__"):
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+        return
+    
+    # The sync SDK's chunk iterator blocks on the network, so pull each chunk off-loop
+    chunk_iter = iter(response)
+    while True:
+        chunk = await asyncio.to_thread(next, chunk_iter, None)
+        if chunk is None:
+            break
+        if chunk.text:
+            yield chunk.text
+
+
+# Transient API errors worth retrying: quota exhausted (429), server errors (5xx) and timeouts
+_TRANSIENT_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+)
+
+
+async def _with_retries(call: Callable[[], Awaitable[Any]], attempts: int = 5,
+                        min_wait: float = 0.5, max_wait: float = 8.0) -> Any:
+    """Await call(), retrying transient errors with jittered exponential backoff.
+    
+    Each wait is drawn uniformly from [min_wait, min(max_wait, min_wait * 2**attempt)], so
+    clients that failed together don't retry together. The last error is re-raised.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return await call()
+        except _TRANSIENT_ERRORS:
+            if attempt == attempts:
+                raise
+            await asyncio.sleep(random.uniform(min_wait, min(max_wait, min_wait * 2 ** attempt)))
+
+
+# The SDK's async client is shared by every default-key model, and its gRPC channel binds to
+# the event loop that first uses it; calls from any other loop run the blocking client on a thread
+_async_sdk_loop: Optional[asyncio.AbstractEventLoop] = None
+_async_sdk_lock = threading.Lock()
+
+
+def _owns_async_sdk() -> bool:
+    """Whether the running loop may use the SDK's async client (claimed by the first loop to ask)."""
+    global _async_sdk_loop
+    loop = asyncio.get_running_loop()
+    if _async_sdk_loop is None:
+        with _async_sdk_lock:
+            if _async_sdk_loop is None:
+                _async_sdk_loop = loop
+    return _async_sdk_loop is loop
+
+
+class TokenBucket:
+    """Token-bucket rate limiter: refills at rate tokens/second, holding at most capacity.
+    
+    One bucket is shared by every event loop that calls a client (each UI loop runs on its own
+    thread), so the refill-and-take step runs under a threading lock; waits happen outside it.
+    """
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    async def acquire(self, tokens: float) -> None:
+        """Wait until tokens are available, then take them (requests above capacity take it all)."""
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            await asyncio.sleep(wait)
+
+
+class KeyedModel:
+    """The parts of genai.GenerativeModel used here, bound to one API key.
+    
+    genai.configure sets a single process-wide key, so a model for another key talks to its
+    own google.ai.generativelanguage GenerativeServiceClient and wraps the replies in the
+    SDK's response type. Calls are blocking, like GenerativeModel.generate_content.
+    """
+    
+    def __init__(self, model_name: str, api_key: str):
+        self.model_name = model_name if model_name.startswith("models/") else f"models/{model_name}"
+        self.service = glm.GenerativeServiceClient(client_options={"api_key": api_key})
+    
+    def generate_content(self, contents: Union[str, List[Any]], generation_config: Any = None,
+                         stream: bool = False) -> Any:
+        """Generate a reply to a prompt string or a list of glm.Content turns."""
+        if isinstance(contents, str):
+            contents = [glm.Content(role="user", parts=[glm.Part(text=contents)])]
+        request = glm.GenerateContentRequest(
+            model=self.model_name,
+            contents=contents,
+            generation_config=glm.GenerationConfig(to_generation_config_dict(generation_config))
+        )
+        if stream:
+            return genai.types.GenerateContentResponse.from_iterator(self.service.stream_generate_content(request))
+        return genai.types.GenerateContentResponse.from_response(self.service.generate_content(request))
+    
+    def start_chat(self, history: Optional[List[Any]] = None) -> "KeyedChat":
+        """Start a conversation on this model."""
+        return KeyedChat(self, history)
+
+
+class KeyedChat:
+    """A conversation on a KeyedModel, resending the history with each message like genai.ChatSession."""
+    
+    def __init__(self, model: KeyedModel, history: Optional[List[Any]] = None):
+        self.model = model
+        self.history: List[Any] = list(history or [])
+        self._last_response: Any = None
+    
+    def send_message(self, message: str, stream: bool = False) -> Any:
+        """Send a message and return the reply (an iterable of chunks if stream)."""
+        self._record_last_reply()
+        content = glm.Content(role="user", parts=[glm.Part(text=message)])
+        response = self.model.generate_content(self.history + [content], stream=stream)
+        self.history.append(content)
+        self._last_response = response
+        return response
+    
+    def _record_last_reply(self) -> None:
+        """Add the previous reply to the history (a stream only once it was fully read)."""
+        response, self._last_response = self._last_response, None
+        if response is None:
+            return
+        try:
+            self.history.append(glm.Content(role="model", parts=[glm.Part(text=response.text)]))
+        except (ValueError, genai.types.IncompleteIterationError):
+            # Unfinished stream or blocked reply: drop the unanswered message so turns stay paired
+            self.history.pop()
 
 
 class GeminiClient:
-    """Client for interacting with Google's Gemini LLM."""
+    """Client for interacting with Google's Gemini LLM.
     
-    def __init__(self, model_name: str = "gemini-1.5-flash"):
+    Uses the globally configured API key unless api_key is given, in which case the client
+    talks to Gemini through a KeyedModel for that key.
+    """
+    
+    # Seconds an endpoint is avoided by GeminiPool after quota/outage errors outlast the retries
+    COOLDOWN = 30.0
+    
+    def __init__(self, model_name: str = "gemini-1.5-flash", api_key: Optional[str] = None):
+        _load_env()
+        if api_key is None:
+            _configure_default_key()
         self.model_name = model_name
-        self.model = genai.GenerativeModel(model_name)
+        self.model = genai.GenerativeModel(model_name) if api_key is None else KeyedModel(model_name, api_key)
         self._conversation = None
+        # Native async calls keep one-shot prompts on the event loop instead of the thread pool,
+        # on the one loop that owns the SDK's async client (see _owns_async_sdk); chat always
+        # runs threaded. Per-key models have no async path and always run threaded.
+        self._async_sdk = hasattr(self.model, "generate_content_async")
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        # Client-side limits, kept under the API quota so load doesn't turn into bursts of 429s:
+        # concurrent requests in flight, and estimated prompt tokens per minute. The token
+        # budget refills continuously, allowing bursts of up to 10 seconds' worth.
+        self.concurrency = int(os.getenv("GEMINI_CONCURRENCY", "8"))
+        tokens_per_minute = int(os.getenv("GEMINI_TPM", "1000000"))
+        self._bucket = TokenBucket(tokens_per_minute / 60, tokens_per_minute / 6)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
     
     async def generate_response(self, prompt: str, temperature: float = 0.1) -> str:
-        """Generate a response from Gemini."""
+        """Generate a response from Gemini (uncached; the agents cache responses in utils.llm_cache)."""
+        return await self._generate_response(prompt, temperature)
+    
+    @contextlib.asynccontextmanager
+    async def _rate_limited(self, prompt: str):
+        """Hold a concurrency slot and spend the prompt's estimated tokens for the duration of a call."""
+        # Semaphores bind to one event loop, so each loop (e.g. a UI's short-lived one) gets its own
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._semaphore_loop = loop
+        
+        async with self._semaphore:
+            await self._bucket.acquire(len(prompt) // 4 + 1)
+            self.in_flight += 1
+            try:
+                yield
+            finally:
+                self.in_flight -= 1
+    
+    @property
+    def healthy(self) -> bool:
+        """False while cooling down after quota/outage errors."""
+        return time.monotonic() >= self.cooldown_until
+    
+    async def _generate_content(self, prompt: str, temperature: float, stream: bool = False,
+                                json_mode: bool = False,
+                                response_schema: Optional[Dict[str, Any]] = None) -> Any:
+        """One generate_content call (natively async when available), retrying transient errors.
+        
+        If transient errors persist through every retry, the client cools down for COOLDOWN seconds.
+        """
         try:
-            response = await asyncio.to_thread(
+            if self._async_sdk and _owns_async_sdk():
+                return await _with_retries(lambda: self.model.generate_content_async(
+                    prompt,
+                    generation_config=_generation_config(temperature, json_mode, response_schema),
+                    stream=stream
+                ))
+            return await _with_retries(lambda: asyncio.to_thread(
                 self.model.generate_content,
                 prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=temperature,
-                    max_output_tokens=2048,
-                )
-            )
+                generation_config=_generation_config(temperature, json_mode, response_schema),
+                stream=stream
+            ))
+        except _TRANSIENT_ERRORS:
+            self.cooldown_until = time.monotonic() + self.COOLDOWN
+            raise
+    
+    async def _generate_response(self, prompt: str, temperature: float, **options) -> str:
+        """Call Gemini for a single prompt (uncached)."""
+        try:
+            async with self._rate_limited(prompt):
+                response = await self._generate_content(prompt, temperature, **options)
             
             if response.text:
-                await logger.log_llm_call(prompt, response.text, "gemini")
+                logger.log_llm_call_nowait(prompt, response.text, "gemini")
                 return response.text
             else:
-                await logger.log_error("Empty response from Gemini", "gemini")
+                logger.log_error_nowait("Empty response from Gemini", "gemini")
                 return ""
                 
         except Exception as e:
-            await logger.log_error(f"Error calling Gemini: {e}", "gemini", e)
+            logger.log_error_nowait(f"Error calling Gemini: {e}", "gemini", e)
             return ""
     
-    async def generate_json_response(self, prompt: str, temperature: float = 0.1) -> Optional[Dict[str, Any]]:
-        """Generate a JSON response from Gemini."""
+    def stream_response(self, prompt: str, temperature: float = 0.1) -> AsyncIterator[str]:
+        """Generate a response from Gemini, yielding text chunks as they are generated."""
+        return self._stream(prompt, temperature)
+    
+    async def _stream(self, prompt: str, temperature: float, **options) -> AsyncIterator[str]:
+        """Stream text chunks for prompt under the given generation options."""
+        chunks = []
         try:
-            # Add JSON formatting instruction to prompt
-            json_prompt = f"{prompt}\n\nPlease respond with valid JSON only."
+            async with self._rate_limited(prompt):
+                response = await self._generate_content(prompt, temperature, stream=True, **options)
+                
+                async for text in _iter_stream_text(response):
+                    chunks.append(text)
+                    yield text
             
-            response_text = await self.generate_response(json_prompt, temperature)
+            if not chunks:
+                logger.log_error_nowait("Empty response from Gemini", "gemini")
+                
+        except Exception as e:
+            logger.log_error_nowait(f"Error streaming from Gemini: {e}", "gemini", e)
+        
+        if chunks:
+            logger.log_llm_call_nowait(prompt, "".join(chunks), "gemini")
+    
+    async def generate_json_response(self, prompt: str, temperature: float = 0.1,
+                                     schema: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Generate a JSON response from Gemini, constrained to schema if given."""
+        try:
+            # JSON mode returns the object as the whole body, so it parses without extraction
+            response_text = await self._generate_response(prompt, temperature,
+                                                          json_mode=True, response_schema=schema)
             
             if not response_text:
                 return None
             
-            # Try to extract JSON from response
-            json_start = response_text.find('{')
-            json_end = response_text.rfind('}') + 1
-            
-            if json_start != -1 and json_end > json_start:
-                json_str = response_text[json_start:json_end]
-                return json.loads(json_str)
-            else:
-                await logger.log_error("No JSON found in response", "gemini")
+            result = orjson.loads(response_text)
+            if not isinstance(result, dict):
+                logger.log_error_nowait("JSON response is not an object", "gemini")
                 return None
+            return result
                 
-        except json.JSONDecodeError as e:
-            await logger.log_error(f"Invalid JSON response: {e}", "gemini", e)
+        except orjson.JSONDecodeError as e:
+            logger.log_error_nowait(f"Invalid JSON response: {e}", "gemini", e)
             return None
         except Exception as e:
-            await logger.log_error(f"Error parsing JSON response: {e}", "gemini", e)
+            logger.log_error_nowait(f"Error parsing JSON response: {e}", "gemini", e)
+            return None
+    
+    async def stream_json_response(self, prompt: str, temperature: float = 0.1,
+                                   schema: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Generate a JSON response from Gemini over a stream, returning as soon as the object is complete."""
+        # Chunks are collected in a list and only joined when one could close the object,
+        # so fragmented streams don't pay for repeated concatenation and parsing
+        chunks: List[str] = []
+        stream = self._stream(prompt, temperature, json_mode=True, response_schema=schema)
+        try:
+            async for chunk in stream:
+                chunks.append(chunk)
+                if chunk.rstrip()[-1:] in ('}', ']'):
+                    candidate = "".join(chunks)
+                    try:
+                        result = orjson.loads(candidate[max(candidate.find('{'), 0):])
+                    except orjson.JSONDecodeError:
+                        continue
+                    if isinstance(result, dict):
+                        return result
+        finally:
+            await stream.aclose()
+        
+        if not chunks:
+            return None
+        
+        # Stream ended without a clean object; fall back to extracting one from the full text
+        try:
+            result = _parse_json_object("".join(chunks))
+            if result is None:
+                logger.log_error_nowait("No JSON found in response", "gemini")
+            return result
+        except orjson.JSONDecodeError as e:
+            logger.log_error_nowait(f"Invalid JSON response: {e}", "gemini", e)
             return None
     
     def start_conversation(self) -> None:
@@ -94,31 +443,180 @@ class GeminiClient:
             self.start_conversation()
         
         try:
-            response = await asyncio.to_thread(
-                self._conversation.send_message,
-                message
-            )
+            async with self._rate_limited(message):
+                response = await _with_retries(lambda: asyncio.to_thread(
+                    self._conversation.send_message,
+                    message
+                ))
             
             if response.text:
-                await logger.log_llm_call(message, response.text, "gemini_chat")
+                logger.log_llm_call_nowait(message, response.text, "gemini_chat")
                 return response.text
             else:
                 return ""
                 
         except Exception as e:
-            await logger.log_error(f"Error in chat: {e}", "gemini", e)
+            logger.log_error_nowait(f"Error in chat: {e}", "gemini", e)
             return ""
+    
+    async def chat_response_stream(self, message: str) -> AsyncIterator[str]:
+        """Send a message in an ongoing conversation, yielding text chunks as they arrive."""
+        if not self._conversation:
+            self.start_conversation()
+        
+        chunks = []
+        try:
+            async with self._rate_limited(message):
+                response = await _with_retries(lambda: asyncio.to_thread(
+                    self._conversation.send_message,
+                    message,
+                    stream=True
+                ))
+                
+                async for text in _iter_stream_text(response):
+                    chunks.append(text)
+                    yield text
+                    
+        except Exception as e:
+            logger.log_error_nowait(f"Error in chat stream: {e}", "gemini", e)
+        
+        if chunks:
+            logger.log_llm_call_nowait(message, "".join(chunks), "gemini_chat")
+
+
+class GeminiPool:
+    """Spreads Gemini calls over several clients (e.g. one per API key or project), with failover.
+    
+    One-shot calls go to the healthy client with the fewest calls in flight. If a call fails and leaves that client cooling down, it is retried on
+    the next candidate. Chat stays on the first client, which holds the conversation history.
+    """
+    
+    def __init__(self, clients: List[GeminiClient]):
+        if not clients:
+            raise ValueError("GeminiPool needs at least one client")
+        self.clients = clients
+    
+    @classmethod
+    def from_env(cls, model_name: str = "gemini-1.5-flash") -> "GeminiPool":
+        """One client per key in GEMINI_API_KEYS (comma-separated), else one on the configured key."""
+        _load_env()
+        keys = [key.strip() for key in os.getenv("GEMINI_API_KEYS", "").split(",") if key.strip()]
+        if not keys:
+            return cls([GeminiClient(model_name)])
+        return cls([GeminiClient(model_name, api_key=key) for key in keys])
+    
+    @property
+    def primary(self) -> GeminiClient:
+        """The client that holds the chat conversation."""
+        return self.clients[0]
+    
+    def _candidates(self) -> List[GeminiClient]:
+        """Clients in the order to try them: healthy ones least-loaded first, then by recovery time."""
+        return sorted(self.clients, key=lambda c: (not c.healthy,
+                                                   c.cooldown_until if not c.healthy else c.in_flight))
+    
+    async def _failover(self, method: str, *args, **kwargs) -> Any:
+        """Call method on each candidate in turn until one succeeds without cooling down."""
+        result = None
+        for client in self._candidates():
+            result = await getattr(client, method)(*args, **kwargs)
+            if result or client.healthy:
+                return result
+        return result
+    
+    async def generate_response(self, prompt: str, temperature: float = 0.1) -> str:
+        """Generate a response on the least-loaded healthy client."""
+        return await self._failover("generate_response", prompt, temperature)
+    
+    async def generate_json_response(self, prompt: str, temperature: float = 0.1,
+                                     schema: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Generate a JSON response on the least-loaded healthy client."""
+        return await self._failover("generate_json_response", prompt, temperature, schema=schema)
+    
+    async def stream_json_response(self, prompt: str, temperature: float = 0.1,
+                                   schema: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Stream a JSON response on the least-loaded healthy client."""
+        return await self._failover("stream_json_response", prompt, temperature, schema=schema)
+    
+    def stream_response(self, prompt: str, temperature: float = 0.1) -> AsyncIterator[str]:
+        """Stream a response from the least-loaded healthy client (no failover mid-stream)."""
+        return self._candidates()[0].stream_response(prompt, temperature)
+    
+    def start_conversation(self) -> None:
+        """Start a new conversation on the primary client."""
+        self.primary.start_conversation()
+    
+    async def chat_response(self, message: str) -> str:
+        """Send a chat message on the primary client."""
+        return await self.primary.chat_response(message)
+    
+    def chat_response_stream(self, message: str) -> AsyncIterator[str]:
+        """Stream a chat reply from the primary client."""
+        return self.primary.chat_response_stream(message)
+
+
+# Response schemas for Gemini's JSON mode (OpenAPI subset), matching the shapes the prompts ask for
+DECISION_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "action": {"type": "string", "enum": ["A", "B", "C", "D", "E"]},
+        "explanation": {"type": "string"},
+        "confidence": {"type": "number"}
+    },
+    "required": ["action", "explanation"]
+}
+
+ADVICE_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "recommendations": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "upgrade": {"type": "string"},
+                    "capacity_kw": {"type": "number"},
+                    "cost_eur": {"type": "number"},
+                    "annual_savings_eur": {"type": "number"},
+                    "roi_years": {"type": "number"},
+                    "co2_reduction_kg": {"type": "number"},
+                    "priority": {"type": "string", "enum": ["high", "medium", "low"]}
+                },
+                "required": ["upgrade", "cost_eur", "annual_savings_eur", "roi_years", "priority"]
+            }
+        },
+        "summary": {"type": "string"}
+    },
+    "required": ["recommendations", "summary"]
+}
 
 
 class PromptBuilder:
     """Builds prompts using Jinja2 templates."""
     
     def __init__(self):
-        self.templates: Dict[str, Template] = {}
+        self.templates: Dict[str, Union[FormatTemplate, Template]] = {}
+        self._sources: Dict[str, str] = {}
+        self._env = Environment(
+            loader=DictLoader(self._sources),
+            bytecode_cache=bytecode_cache("orchestrator_%s.cache"),
+            auto_reload=False
+        )
     
     def add_template(self, name: str, template_str: str) -> None:
-        """Add a Jinja2 template."""
-        self.templates[name] = Template(template_str)
+        """Add a Jinja2 template.
+        
+        Templates with only `{{ var }}` substitutions are pre-rendered to a format string and
+        skip Jinja entirely at render time.
+        """
+        if is_simple_template(template_str):
+            self._sources.pop(name, None)
+            self.templates[name] = FormatTemplate(template_str)
+            return
+        
+        self._sources[name] = template_str
+        # Load through the loader (not get_template) so re-adding a name always recompiles
+        self.templates[name] = self._env.loader.load(self._env, name)
     
     def render_template(self, name: str, **kwargs) -> str:
         """Render a template with given variables."""
@@ -136,7 +634,7 @@ class LLMOrchestrator:
     """Orchestrates LLM interactions for the decarbonization system."""
     
     def __init__(self):
-        self.gemini_client = GeminiClient()
+        self.gemini_client = GeminiPool.from_env()
         self.prompt_builder = PromptBuilder()
         self._setup_default_templates()
     
@@ -216,6 +714,20 @@ Response should be:
 - Include next steps if needed
 """
         self.prompt_builder.add_template("escalation_chat", escalation_template)
+        
+        # Combined tick template: several task prompts marshaled into one request
+        combined_template = """
+You are an AI energy management assistant handling several independent tasks at once.
+Answer each task below on its own, following its instructions.
+{% for name, prompt in sections %}
+<{{ name | upper }}>
+{{ prompt }}
+</{{ name | upper }}>
+{% endfor %}
+Return a single JSON object with exactly these keys: {{ sections | map(attribute=0) | join(", ") }}.
+Each key holds that task's answer: the requested JSON object, or a plain string for escalation tasks.
+"""
+        self.prompt_builder.add_template("combined_tick", combined_template)
     
     async def make_decision(self, solar_kwh: float, load_kwh: float, battery_soc: float, 
                            price: float, co2_intensity: float) -> Optional[Dict[str, Any]]:
@@ -227,7 +739,7 @@ Response should be:
                                                    price=price,
                                                    co2_intensity=co2_intensity)
         
-        return await self.gemini_client.generate_json_response(prompt)
+        return await self.gemini_client.generate_json_response(prompt, schema=DECISION_SCHEMA)
     
     async def get_infrastructure_advice(self, daily_consumption: float, solar_capacity: float,
                                       battery_capacity: float, annual_cost: float, 
@@ -240,7 +752,7 @@ Response should be:
                                                    annual_cost=annual_cost,
                                                    annual_co2=annual_co2)
         
-        return await self.gemini_client.generate_json_response(prompt)
+        return await self.gemini_client.generate_json_response(prompt, schema=ADVICE_SCHEMA)
     
     async def handle_escalation(self, alert_message: str, system_status: str) -> str:
         """Handle escalation with professional response."""
@@ -250,10 +762,163 @@ Response should be:
         
         return await self.gemini_client.generate_response(prompt)
     
+    def stream_escalation(self, alert_message: str, system_status: str) -> AsyncIterator[str]:
+        """Stream the escalation response chunk by chunk, for callers that relay it as it arrives."""
+        prompt = self.prompt_builder.render_template("escalation_chat",
+                                                   alert_message=alert_message,
+                                                   system_status=system_status)
+        
+        return self.gemini_client.stream_response(prompt)
+    
+    async def combined_tick(self, state: SystemState, include_decision: bool = True,
+                            include_advice: bool = False, escalation_alerts: Optional[List[str]] = None,
+                            max_prompt_chars: int = 8000) -> Dict[str, Any]:
+        """Run decision, advice and escalation prompts for one state snapshot in a single LLM call.
+        
+        Sections are added in priority order (decision, escalations, advice) until the prompt
+        would exceed max_prompt_chars; skipped sections are listed under "skipped" so callers
+        can fall back to the individual methods.
+        """
+        candidates = []
+        if include_decision:
+            candidates.append(("decision", self.prompt_builder.render_template(
+                "decision",
+                solar_kwh=state.solar_forecast_kwh,
+                load_kwh=state.load_forecast_kwh,
+                battery_soc=state.battery_soc,
+                price=state.grid_price,
+                co2_intensity=state.co2_intensity)))
+        for i, alert_message in enumerate(escalation_alerts or []):
+            candidates.append((f"escalation_{i}", self.prompt_builder.render_template(
+                "escalation_chat",
+                alert_message=alert_message,
+                system_status=state.system_status)))
+        if include_advice:
+            candidates.append(("infrastructure_advice", self.prompt_builder.render_template(
+                "infrastructure_advice",
+                daily_consumption=state.load_kwh,
+                solar_capacity=state.solar_kwh,
+                battery_capacity=state.battery_soc,
+                annual_cost=state.total_cost_eur * 365,
+                annual_co2=state.total_co2_kg * 365)))
+        
+        # Size cap: stop marshaling once the prompt gets too large, always keep the first section
+        sections, skipped, total_chars = [], [], 0
+        for name, prompt in candidates:
+            if sections and total_chars + len(prompt) > max_prompt_chars:
+                skipped.append(name)
+                continue
+            sections.append((name, prompt))
+            total_chars += len(prompt)
+        
+        results: Dict[str, Any] = {"skipped": skipped}
+        if not sections:
+            return results
+        
+        prompt = self.prompt_builder.render_template("combined_tick", sections=sections)
+        response = await self.gemini_client.generate_json_response(prompt) or {}
+        
+        results["decision"] = response.get("decision") if include_decision else None
+        results["infrastructure_advice"] = response.get("infrastructure_advice") if include_advice else None
+        results["escalations"] = [response.get(f"escalation_{i}") for i in range(len(escalation_alerts or []))]
+        return results
+    
+    async def batch(self, method: str, rows: List[Dict[str, Any]], out_path: str,
+                    concurrency: int = 32, fsync_every: int = 100) -> Dict[str, int]:
+        """Run make_decision or get_infrastructure_advice over many inputs, checkpointed to JSONL.
+        
+        Each finished row is appended to out_path as {"key", "input", "output"}, keyed by a hash
+        of the row's content. Rerunning with the same file skips rows already recorded, so an
+        interrupted run resumes where it stopped. Rows whose call fails are not recorded and are
+        retried on the next run.
+        """
+        handlers = {
+            "make_decision": self.make_decision,
+            "get_infrastructure_advice": self.get_infrastructure_advice,
+        }
+        if method not in handlers:
+            raise ValueError(f"Unsupported batch method '{method}'")
+        handler = handlers[method]
+        
+        def row_key(row: Dict[str, Any]) -> str:
+            return hashlib.blake2b(orjson.dumps(row, option=orjson.OPT_SORT_KEYS), digest_size=16).hexdigest()
+        
+        done_keys = set()
+        ends_cleanly = True
+        if os.path.exists(out_path):
+            with open(out_path, 'rb') as f:
+                for line in f:
+                    ends_cleanly = line.endswith(b"\n")
+                    try:
+                        done_keys.add(orjson.loads(line)["key"])
+                    except (orjson.JSONDecodeError, KeyError, TypeError):
+                        continue  # Partial last line from an interrupted run
+        
+        pending = [(key, row) for key, row in ((row_key(row), row) for row in rows) if key not in done_keys]
+        stats = {"completed": 0, "skipped": len(rows) - len(pending), "failed": 0}
+        if not pending:
+            return stats
+        
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def run(key: str, row: Dict[str, Any]):
+            async with semaphore:
+                return key, row, await handler(**row)
+        
+        with open(out_path, 'ab') as f:
+            if not ends_cleanly:
+                f.write(b"\n")  # Don't glue the first new record onto a truncated one
+            for next_done in asyncio.as_completed([run(key, row) for key, row in pending]):
+                key, row, output = await next_done
+                if output is None:
+                    stats["failed"] += 1
+                    continue
+                
+                f.write(orjson.dumps({"key": key, "input": row, "output": output},
+                                     default=str, option=orjson.OPT_APPEND_NEWLINE))
+                stats["completed"] += 1
+                if stats["completed"] % fsync_every == 0:
+                    f.flush()
+                    os.fsync(f.fileno())
+            
+            f.flush()
+            os.fsync(f.fileno())
+        
+        logger.log_event_nowait("llm_batch_completed", {"method": method, **stats}, "gemini")
+        return stats
+    
     async def chat_response(self, message: str) -> str:
         """Get a chat response for general queries."""
         return await self.gemini_client.chat_response(message)
+    
+    def chat_response_stream(self, message: str) -> AsyncIterator[str]:
+        """Stream a chat response for general queries, chunk by chunk."""
+        return self.gemini_client.chat_response_stream(message)
+
+
+class _LazyOrchestrator:
+    """Stands in for the global LLMOrchestrator, building it on first attribute access.
+    
+    Importing this module stays cheap (no SDK client, model or templates), and a missing API
+    key surfaces on first use rather than at import.
+    """
+    
+    def __init__(self):
+        self._instance: Optional[LLMOrchestrator] = None
+        self._lock = threading.Lock()
+    
+    def _get(self) -> LLMOrchestrator:
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = LLMOrchestrator()
+                instance = self._instance
+        return instance
+    
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._get(), name)
 
 
-# Global LLM orchestrator instance
-llm_orchestrator = LLMOrchestrator() 
\ No newline at end of file
+# Global LLM orchestrator instance (constructed lazily)
+llm_orchestrator = _LazyOrchestrator() 
\ No newline at end of file
@@ -0,0 +1,98 @@
+"""
+Response cache for LLM calls in the decarbonization AI system.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class LLMCache:
+    """LRU cache with TTL for LLM responses, keyed on bucketized inputs."""
+
+    def __init__(self, maxsize: int = 512, ttl: float = 60 * 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, "asyncio.Task"] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, ttl: Optional[float] = None) -> Optional[Any]:
+        """Get a cached value, or None if missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        stored_at, value = entry
+        if time.monotonic() - stored_at > (self.ttl if ttl is None else ttl):
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entry if full."""
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def get_or_call(self, key: Hashable, factory: Callable[[], Awaitable[Any]],
+                          ttl: Optional[float] = None) -> Any:
+        """Return the cached value for key, or await factory() and cache its result.
+
+        Concurrent misses on the same key share a single in-flight call (single-flight): every
+        caller awaits the same task and gets its result or exception, failures included, so a
+        burst of identical requests costs one call. Cancelling one caller doesn't cancel the
+        call for the others.
+        """
+        value = self.get(key, ttl)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        # Tasks belong to one event loop; callers on another loop start their own call
+        loop = asyncio.get_running_loop()
+        task = self._inflight.get(key)
+        if task is None or task.get_loop() is not loop:
+            self.misses += 1
+            task = loop.create_task(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            self.hits += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: "asyncio.Task") -> None:
+        """Retire a finished in-flight call, caching its result before any waiter resumes."""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Reading the exception also marks it retrieved when every waiter was cancelled
+        if task.cancelled() or task.exception() is not None:
+            return
+        value = task.result()
+        # Don't cache failed/empty responses
+        if value:
+            self.set(key, value)
+
+    def clear(self) -> None:
+        """Clear all cached entries."""
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+# Global cache instance: the only cache for LLM responses (GeminiClient doesn't cache). Agents key
+# it on their bucketized inputs and choose the TTL per call: decisions and escalations use the
+# default hour, infrastructure advice a day.
+llm_cache = LLMCache()
@@ -0,0 +1,67 @@
+"""
+Lightweight prompt templating shared by the orchestrator and chatbot prompts.
+"""
+
+import os
+import re
+import tempfile
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Optional
+
+from jinja2 import FileSystemBytecodeCache
+
+# A bare `{{ var }}` substitution, the only construct FormatTemplate supports
+_PLACEHOLDER_RE = re.compile(r"{{\s*(\w+)\s*}}")
+
+
+class _BlankMissing(dict):
+    """Renders missing variables as empty strings, like Jinja's default Undefined."""
+    
+    def __missing__(self, key: str) -> str:
+        return ""
+
+
+@dataclass(frozen=True)
+class FormatTemplate:
+    """Template with only `{{ var }}` substitutions, rendered through str.format_map."""
+    source: str
+    fmt: str = field(init=False, repr=False)
+    
+    def __post_init__(self):
+        # Split into literal text and variable names; escape literal braces (e.g. JSON examples).
+        # Like Jinja, a single trailing newline is dropped.
+        source = self.source[:-1] if self.source.endswith("\n") else self.source
+        parts = _PLACEHOLDER_RE.split(source)
+        fmt = "".join(
+            part.replace("{", "{{").replace("}", "}}") if i % 2 == 0 else "{" + part + "}"
+            for i, part in enumerate(parts)
+        )
+        object.__setattr__(self, "fmt", fmt)
+    
+    def render(self, **kwargs: Any) -> str:
+        """Render the template with the given variables."""
+        return self.fmt.format_map(_BlankMissing(kwargs))
+
+
+def is_simple_template(source: str) -> bool:
+    """True if source uses nothing but bare `{{ var }}` substitutions (no tags, comments or filters)."""
+    return not ("{%" in source or "{#" in source or "{{" in _PLACEHOLDER_RE.sub("", source))
+
+
+# Compiled template bytecode is cached on disk (validated against a checksum of the source),
+# so warm starts and worker processes skip lexing, parsing and code generation
+_BYTECODE_CACHE_DIR = os.path.join(tempfile.gettempdir(), "decarbon_jinja")
+
+
+@lru_cache(maxsize=None)
+def bytecode_cache(pattern: str = "__jinja2_%s.cache") -> Optional[FileSystemBytecodeCache]:
+    """The shared on-disk bytecode cache, creating its directory on first use.
+    
+    Returns None, so templates compile uncached, if the directory can't be created.
+    """
+    try:
+        os.makedirs(_BYTECODE_CACHE_DIR, exist_ok=True)
+    except OSError:
+        return None
+    return FileSystemBytecodeCache(_BYTECODE_CACHE_DIR, pattern=pattern)